@@ -0,0 +1,53 @@
+class WentgesSmoothing:
+    # Dual stabilization of the column generation by Wentges smoothing. The
+    # pricing problem is solved at a separation point between the duals of
+    # the restricted master problem and a stability center, the duals with
+    # the best Lagrangian bound so far:
+    #     separation = alpha * center + (1 - alpha) * duals
+    # If none of the columns found has a negative reduced cost for the duals
+    # of the restricted master problem (mispricing), alpha is decreased until
+    # it reaches 0, so that the column generation only stops after the
+    # pricing problem has been solved for the duals themselves.
+    # A smoothing factor of 0 disables the stabilization. It must be smaller
+    # than 1.
+
+    def __init__(self, smoothing_factor=0):
+        if not 0 <= smoothing_factor < 1:
+            raise ValueError(
+                    "The smoothing factor must be in [0, 1), got "
+                    f"{smoothing_factor}.")
+        self.smoothing_factor = smoothing_factor
+        # Maximum number of separation points before the duals themselves.
+        self.maximum_number_of_steps = 10
+        self.center = None
+        self.center_bound = float('-inf')
+        self.number_of_center_updates = 0
+
+    def reset(self):
+        # The Lagrangian bounds of different sets of fixed columns can't be
+        # compared.
+        self.center = None
+        self.center_bound = float('-inf')
+
+    def separation_points(self, duals):
+        # Yield the successive separation points of a pricing call, the last
+        # one being duals.
+        if self.center is None or self.smoothing_factor <= 0:
+            yield duals
+            return
+        alpha = self.smoothing_factor
+        step = max(1 - self.smoothing_factor,
+                   self.smoothing_factor / self.maximum_number_of_steps)
+        # The tolerance avoids a nearly zero factor due to rounding errors.
+        while alpha > 1e-6:
+            yield [alpha * c + (1 - alpha) * d
+                   for c, d in zip(self.center, duals)]
+            alpha -= step
+        yield duals
+
+    def update(self, point, bound):
+        # Update the stability center with the Lagrangian bound of point.
+        if bound > self.center_bound:
+            self.center = list(point)
+            self.center_bound = bound
+            self.number_of_center_updates += 1
@@ -0,0 +1,13 @@
+import itertools
+
+
+# Translation table of bytes.translate turning in_batch into a mask of the
+# free jobs.
+FREE_JOBS_TABLE = bytes([1]) + bytes(255)
+
+
+def free_jobs(in_batch):
+    # Return the jobs which are not in a batch, by increasing id, where
+    # in_batch[j] == 1 if job j is in a batch.
+    return list(itertools.compress(
+        range(len(in_batch)), in_batch.translate(FREE_JOBS_TABLE)))
@@ -0,0 +1,102 @@
+import math
+
+
+def greedy_clique(instance, number_of_starts=32):
+    # Return a clique of the conflict graph with a large total processing
+    # time. Cliques are built greedily, adding the longest common neighbor,
+    # from the jobs with the largest processing time times degree.
+    instance.build_conflict_index()
+    offsets = instance.conflict_offsets
+    neighbors = instance.conflict_neighbors
+    processing_times = instance.processing_times
+    starts = sorted(
+            (job_id for job_id in range(len(processing_times))
+             if offsets[job_id + 1] > offsets[job_id]),
+            key=lambda job_id: (processing_times[job_id]
+                                * (offsets[job_id + 1] - offsets[job_id])),
+            reverse=True)[:number_of_starts]
+    best_clique = []
+    best_value = 0
+    for job_id in starts:
+        clique = [job_id]
+        candidates = set(neighbors[offsets[job_id]:offsets[job_id + 1]])
+        while candidates:
+            job_id = max(candidates, key=lambda j: processing_times[j])
+            clique.append(job_id)
+            candidates.intersection_update(
+                    neighbors[offsets[job_id]:offsets[job_id + 1]])
+        value = sum(processing_times[j] for j in clique)
+        if value > best_value:
+            best_clique = clique
+            best_value = value
+    return best_clique
+
+
+def bin_packing_bound(instance, clique=()):
+    # Consider the jobs by decreasing processing time. When the jobs seen so
+    # far need k batches, at least k batches have a processing time larger
+    # than or equal to the processing time of the current job. The number of
+    # batches needed by a set of jobs is at least:
+    # - its total size divided by the batch capacity
+    # - its number of jobs larger than half the batch capacity
+    # - its number of jobs in the given clique of the conflict graph
+    # It only reads the capacity, the processing times and the sizes of the
+    # instance, and also applies to the instances of batchschedulingmakespan.
+    capacity = instance.batch_capacity
+    processing_times = instance.processing_times
+    sizes = instance.sizes
+    in_clique = set(clique)
+    bound = 0
+    number_of_batches = 0
+    total_size = 0
+    number_of_large_jobs = 0
+    number_of_clique_jobs = 0
+    for job_id in sorted(range(len(processing_times)),
+                         key=lambda job_id: processing_times[job_id],
+                         reverse=True):
+        total_size += sizes[job_id]
+        if 2 * sizes[job_id] > capacity:
+            number_of_large_jobs += 1
+        if job_id in in_clique:
+            number_of_clique_jobs += 1
+        needed = max(
+                math.ceil(total_size / capacity),
+                number_of_large_jobs,
+                number_of_clique_jobs)
+        if needed > number_of_batches:
+            bound += (needed - number_of_batches) * processing_times[job_id]
+            number_of_batches = needed
+    return bound
+
+
+def round_bound(instance, bound, tolerance=1e-6):
+    # The makespan is integral if all the processing times are.
+    if all(isinstance(processing_time, int)
+           for processing_time in instance.processing_times):
+        return math.ceil(bound - tolerance)
+    return bound
+
+
+def lower_bound(instance, lp_bound=None):
+    # Lower bound of an instance of batchschedulingwithconflictsmakespan.
+    # lp_bound is a lower bound on the value of the linear relaxation of the
+    # master problem, for example its Lagrangian bound. The value returned by
+    # the column generation is only one up to the tolerance on the reduced
+    # costs, and only if it was solved with an exact pricing algorithm.
+    bound = bin_packing_bound(instance, greedy_clique(instance))
+    if lp_bound is not None:
+        bound = max(bound, round_bound(instance, lp_bound))
+    return bound
+
+
+def compute_gap(value, bound):
+    # Return the absolute gap and the relative gap in percent.
+    absolute_gap = value - bound
+    denom = max(abs(value), abs(bound))
+    if absolute_gap == 0:
+        relative_gap = 0
+    elif denom != 0:
+        relative_gap = 100.0 * absolute_gap / denom
+    else:
+        relative_gap = float('inf')
+    return absolute_gap, relative_gap
@@ -1,6 +1,12 @@
 import json
+import time
 import columngenerationsolverpy
+import columngenerationsolverpy.commons
 import knapsackwithwidth
+import batchschedulinglowerbounds
+import batchschedulingpricingstatistics
+import batchschedulingdualstabilization
+import batchschedulingfreejobs
 
 
 class Job:
@@ -14,6 +20,10 @@ class Instance:
     def __init__(self, filepath=None):
         self.jobs = []
         self.batch_capacity = 1
+        # Attributes of the jobs, indexed by job id, as read by
+        # batchschedulinglowerbounds.bin_packing_bound.
+        self.processing_times = []
+        self.sizes = []
         if filepath is not None:
             with open(filepath) as json_file:
                 data = json.load(json_file)
@@ -30,6 +40,8 @@ class Instance:
         job.processing_time = processing_time
         job.size = size
         self.jobs.append(job)
+        self.processing_times.append(processing_time)
+        self.sizes.append(size)
 
     def write(self, filepath):
         data = {"batch_capacity": self.batch_capacity,
@@ -39,80 +51,161 @@ class Instance:
         with open(filepath, 'w') as json_file:
             json.dump(data, json_file)
 
-    def check(self, filepath):
-        print("Checker")
-        print("-------")
+    def check_solution(self, batches):
+        processing_times = [job.processing_time for job in self.jobs]
+        sizes = [job.size for job in self.jobs]
+        # Compute makespan.
+        makespan = sum(max((processing_times[job_id] for job_id in batch),
+                           default=0)
+                       for batch in batches)
+        # Compute number_of_overweighted_batches.
+        number_of_overweighted_batches = sum(
+                sum(sizes[job_id] for job_id in batch)
+                > self.batch_capacity
+                for batch in batches)
+        # Compute number_of_scheduled_jobs and number_of_duplicates.
+        number_of_job_occurrences = sum(len(batch) for batch in batches)
+        job_set = set(job_id for batch in batches for job_id in batch)
+        number_of_scheduled_jobs = len(job_set)
+        number_of_duplicates = number_of_job_occurrences - len(job_set)
+
+        is_feasible = (
+                (number_of_scheduled_jobs == len(self.jobs)) and
+                (number_of_duplicates == 0) and
+                (number_of_overweighted_batches == 0))
+        return {
+                "makespan": makespan,
+                "number_of_scheduled_jobs": number_of_scheduled_jobs,
+                "number_of_duplicates": number_of_duplicates,
+                "number_of_overweighted_batches": number_of_overweighted_batches,
+                "feasible": is_feasible}
+
+    def check(self, filepath, verbose=True):
         with open(filepath) as json_file:
             data = json.load(json_file)
-            # Compute makespan.
-            makespan = sum(max(self.jobs[job_id].processing_time
-                               for job_id in batch)
-                           for batch in data["jobs"])
-            # Compute number_of_overweighted_batches.
-            number_of_overweighted_batches = sum(
-                    sum(self.jobs[job_id].size for job_id in batch)
-                    > self.batch_capacity
-                    for batch in data["jobs"])
-            # Compute number_of_scheduled_jobs and number_of_duplicates.
-            job_list = [job_id
-                        for batch in data["jobs"]
-                        for job_id in batch]
-            job_set = set(job_list)
-            number_of_scheduled_jobs = len(job_set)
-            number_of_duplicates = len(job_list) - len(job_set)
-
-            is_feasible = (
-                    (number_of_scheduled_jobs == len(self.jobs)) and
-                    (number_of_duplicates == 0) and
-                    (number_of_overweighted_batches == 0))
-            print(f"Makespan: {makespan}")
-            print(f"Number of scheduled jobs: {number_of_scheduled_jobs}")
-            print(f"Number of duplicates: {number_of_duplicates}")
+        report = self.check_solution(data["jobs"])
+        if verbose:
+            print("Checker")
+            print("-------")
+            print(f"Makespan: {report['makespan']}")
+            print(f"Number of scheduled jobs: {report['number_of_scheduled_jobs']}")
+            print(f"Number of duplicates: {report['number_of_duplicates']}")
             print(f"Number of overweighted batches: "
-                  f"{number_of_overweighted_batches}")
-            print(f"Feasible: {is_feasible}")
-            return (is_feasible, makespan)
+                  f"{report['number_of_overweighted_batches']}")
+            print(f"Feasible: {report['feasible']}")
+            bound = batchschedulinglowerbounds.bin_packing_bound(self)
+            _, relative_gap = batchschedulinglowerbounds.compute_gap(
+                    report["makespan"], bound)
+            print(f"Lower bound: {bound}")
+            print(f"Gap (%): {round(relative_gap, 2)}")
+        return (report["feasible"], report["makespan"])
 
 
 class PricingSolver:
 
-    def __init__(self, instance):
+    def __init__(self, instance, trace_path=None):
         self.instance = instance
-        self.in_batch = None # (in_batch >> j) & 1 == 1 if object j is in a batch
+        number_of_jobs = len(instance.jobs)
+        self.in_batch = bytearray(number_of_jobs)  # in_batch[j] == 1 if job j is in a batch
+        # Ids of the fixed columns of the last call to initialize_pricing.
+        self.fixed_column_ids = set()
+        # Jobs which are not in a fixed column, by increasing id.
+        self.free_jobs = list(range(number_of_jobs))
+        self.sizes = [job.size for job in instance.jobs]
+        self.processing_times = [job.processing_time for job in instance.jobs]
+        self.statistics = batchschedulingpricingstatistics.PricingStatistics(
+                trace_path)
+        self.stabilization = batchschedulingdualstabilization.WentgesSmoothing()
 
     def initialize_pricing(self, columns, fixed_columns):
-        self.in_batch = 0
-        for column_id, column_value in fixed_columns:
-            column = columns[column_id]
-            if column_value == 1:
+        self.statistics.new_epoch()
+        self.stabilization.reset()
+        # Only update the jobs of the columns which have been unfixed or fixed
+        # since the previous call.
+        fixed_column_ids = set(
+                column_id for column_id, column_value in fixed_columns
+                if column_value == 1)
+        if fixed_column_ids == self.fixed_column_ids:
+            return
+        in_batch = self.in_batch
+        for value, column_ids in (
+                (0, self.fixed_column_ids - fixed_column_ids),
+                (1, fixed_column_ids - self.fixed_column_ids)):
+            for column_id in column_ids:
+                column = columns[column_id]
                 for row_index, row_coefficient in zip(column.row_indices, column.row_coefficients):
                     if row_coefficient == 1:
-                        self.in_batch += (1 << row_index)
+                        in_batch[row_index] = value
+        self.fixed_column_ids = fixed_column_ids
+        self.free_jobs = batchschedulingfreejobs.free_jobs(in_batch)
 
     def solve_pricing(self, duals):
+        # Solve the subproblem at the separation points of the dual
+        # stabilization until a column with a negative reduced cost for duals
+        # is found.
+        # The pricing is exact, so the Lagrangian bound of a point is the sum
+        # of its free duals plus the number of free jobs, which bounds the
+        # number of batches, times the smallest reduced cost.
+        time_build = 0
+        time_solve = 0
+        number_of_mispricings = -1
+        for separation_duals in self.stabilization.separation_points(duals):
+            number_of_mispricings += 1
+            column, info = self.solve_subproblem(separation_duals)
+            time_build += info["time_build"]
+            time_solve += info["time_solve"]
+            self.stabilization.update(
+                    separation_duals,
+                    sum(separation_duals[job_id] for job_id in self.free_jobs)
+                    + len(self.free_jobs) * min(
+                        0, columngenerationsolverpy.commons.compute_reduced_cost(
+                            column, separation_duals)))
+            if (
+                    separation_duals is not duals
+                    and columngenerationsolverpy.commons.compute_reduced_cost(
+                        column, duals)
+                    <= -columngenerationsolverpy.TOL):
+                break
+
+        self.statistics.add_call(
+                [columngenerationsolverpy.commons.compute_reduced_cost(
+                    column, duals)],
+                time_build=time_build,
+                time_solve=time_solve,
+                subproblem_size=info["subproblem_size"],
+                number_of_mispricings=number_of_mispricings)
+        return [column]
+
+    def solve_subproblem(self, duals):
+        # Return the best column for the given duals, and the statistics of
+        # the subproblem.
         # Build subproblem instance.
+        start_time = time.time()
         sizes = []
         profits = []
         processing_times = []
         real_ids = []
 
-        for job_id, job in enumerate(self.instance.jobs):
+        for job_id in self.free_jobs:
             profit = duals[job_id]
             if profit <= 0:
                 continue
-            if not((self.in_batch >> job_id) & 1):
-                profits.append(profit)
-                sizes.append(job.size)
-                processing_times.append(job.processing_time)
-                real_ids.append(job_id)
+            profits.append(profit)
+            sizes.append(self.sizes[job_id])
+            processing_times.append(self.processing_times[job_id])
+            real_ids.append(job_id)
+
+        time_build = time.time() - start_time
 
         # Solve subproblem instance.
+        start_time = time.time()
         knapsack_instance = knapsackwithwidth.Instance()
         knapsack_instance.capacity = self.instance.batch_capacity
         for i in range(len(sizes)):
             knapsack_instance.add_item(sizes[i], processing_times[i], profits[i])
         
         solution_kp = knapsackwithwidth.dynamic_programming(knapsack_instance)
+        time_solve = time.time() - start_time
 
         # Retrieve column.
         column = columngenerationsolverpy.Column()
@@ -122,14 +215,19 @@ class PricingSolver:
             job_id = real_ids[i]
             column.row_indices.append(job_id)
             column.row_coefficients.append(1)
-            max_proc_time = max(max_proc_time, self.instance.jobs[job_id].processing_time)
+            max_proc_time = max(max_proc_time, self.processing_times[job_id])
 
         column.objective_coefficient = max_proc_time
 
-        return [column]
+        return column, {
+                "time_build": time_build,
+                "time_solve": time_solve,
+                "subproblem_size": len(real_ids)}
 
 
-def get_parameters(instance):
+def get_parameters(instance, trace_path=None, smoothing_factor=0):
+    stabilization = batchschedulingdualstabilization.WentgesSmoothing(
+            smoothing_factor)
     number_of_constraints = len(instance.jobs)
     p = columngenerationsolverpy.Parameters(number_of_constraints)
     # Objective sense.
@@ -147,7 +245,8 @@ def get_parameters(instance):
     p.dummy_column_objective_coefficient = max(job.processing_time for job in instance.jobs) + 1
 
     # Pricing solver.
-    p.pricing_solver = PricingSolver(instance)
+    p.pricing_solver = PricingSolver(instance, trace_path)
+    p.pricing_solver.stabilization = stabilization
     return p
 
 
@@ -181,6 +280,17 @@ if __name__ == "__main__":
             type=str,
             default="AMOP-Batch-scheduling/certificate.json",
             help='')
+    parser.add_argument(
+            "--pricing-trace",
+            type=str,
+            default=None,
+            help='file where the statistics of each pricing call are written')
+    parser.add_argument(
+            "--smoothing-factor",
+            type=float,
+            default=0,
+            help='Wentges smoothing factor of the dual stabilization, between '
+            '0 (disabled) and 1')
 
     args = parser.parse_args()
 
@@ -190,18 +300,26 @@ if __name__ == "__main__":
 
     elif args.algorithm == "column_generation":
         instance = Instance(args.instance)
-        output = columngenerationsolverpy.column_generation(
-                get_parameters(instance))
+        parameters = get_parameters(
+                instance, args.pricing_trace, args.smoothing_factor)
+        output = columngenerationsolverpy.column_generation(parameters)
+        print()
+        parameters.pricing_solver.statistics.print()
+        parameters.pricing_solver.statistics.close()
 
     else:
         instance = Instance(args.instance)
-        parameters = get_parameters(instance)
+        parameters = get_parameters(
+                instance, args.pricing_trace, args.smoothing_factor)
         if args.algorithm == "greedy":
             output = columngenerationsolverpy.greedy(
                     parameters)
         elif args.algorithm == "limited_discrepancy_search":
             output = columngenerationsolverpy.limited_discrepancy_search(
                     parameters, time_limit=60)
+        print()
+        parameters.pricing_solver.statistics.print()
+        parameters.pricing_solver.statistics.close()
         solution = to_solution(parameters.columns, output["solution"])
         if args.certificate is not None:
             data = {"jobs": solution}
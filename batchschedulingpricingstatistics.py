@@ -0,0 +1,120 @@
+import json
+
+
+class PricingStatistics:
+    # Counters and timers of a pricing solver. An epoch is the sequence of
+    # calls to solve_pricing following a call to initialize_pricing.
+
+    def __init__(self, trace_path=None):
+        self.number_of_epochs = 0
+        self.number_of_calls = 0
+        self.number_of_calls_in_epoch = 0
+        self.maximum_number_of_calls_per_epoch = 0
+        # Number of calls answered from the column pool, without solving a
+        # subproblem.
+        self.number_of_pool_calls = 0
+        self.number_of_columns = 0
+        self.time_build = 0
+        self.time_solve = 0
+        # Subproblem sizes, after removing the jobs with a non-positive dual
+        # value and the jobs already in a fixed batch.
+        self.total_subproblem_size = 0
+        self.maximum_subproblem_size = 0
+        self.total_number_of_conflicts = 0
+        self.maximum_number_of_conflicts = 0
+        # Number of calls answered by each stage of the pricing algorithm.
+        self.number_of_calls_per_stage = {}
+        # Number of separation points of the dual stabilization at which no
+        # column with a negative reduced cost was found.
+        self.number_of_mispricings = 0
+        # Smallest reduced cost returned by the last call.
+        self.last_reduced_cost = None
+        # Per-call trace, one JSON object per line.
+        self.trace_file = None
+        if trace_path is not None:
+            self.trace_file = open(trace_path, 'w', buffering=1)
+
+    def new_epoch(self):
+        self.number_of_epochs += 1
+        self.number_of_calls_in_epoch = 0
+
+    def add_call(
+            self,
+            reduced_costs,
+            time_build=0,
+            time_solve=0,
+            subproblem_size=0,
+            number_of_conflicts=0,
+            from_pool=False,
+            stage=None,
+            number_of_mispricings=0):
+        self.number_of_calls += 1
+        self.number_of_calls_in_epoch += 1
+        self.maximum_number_of_calls_per_epoch = max(
+                self.maximum_number_of_calls_per_epoch,
+                self.number_of_calls_in_epoch)
+        if from_pool:
+            self.number_of_pool_calls += 1
+        if stage is not None:
+            self.number_of_calls_per_stage[stage] = \
+                self.number_of_calls_per_stage.get(stage, 0) + 1
+        self.number_of_mispricings += number_of_mispricings
+        self.number_of_columns += len(reduced_costs)
+        self.time_build += time_build
+        self.time_solve += time_solve
+        self.total_subproblem_size += subproblem_size
+        self.maximum_subproblem_size = max(
+                self.maximum_subproblem_size, subproblem_size)
+        self.total_number_of_conflicts += number_of_conflicts
+        self.maximum_number_of_conflicts = max(
+                self.maximum_number_of_conflicts, number_of_conflicts)
+        self.last_reduced_cost = min(reduced_costs, default=None)
+        if self.trace_file is not None:
+            self.trace_file.write(json.dumps({
+                "epoch": self.number_of_epochs,
+                "call": self.number_of_calls_in_epoch,
+                "from_pool": from_pool,
+                "stage": stage,
+                "number_of_mispricings": number_of_mispricings,
+                "time_build": time_build,
+                "time_solve": time_solve,
+                "subproblem_size": subproblem_size,
+                "number_of_conflicts": number_of_conflicts,
+                "reduced_costs": reduced_costs}) + "\n")
+
+    def to_dict(self):
+        number_of_solved_calls = self.number_of_calls - self.number_of_pool_calls
+        return {
+                "number_of_epochs": self.number_of_epochs,
+                "number_of_calls": self.number_of_calls,
+                "maximum_number_of_calls_per_epoch":
+                self.maximum_number_of_calls_per_epoch,
+                "number_of_pool_calls": self.number_of_pool_calls,
+                "number_of_columns": self.number_of_columns,
+                "time_build": self.time_build,
+                "time_solve": self.time_solve,
+                "average_subproblem_size": (
+                    self.total_subproblem_size / number_of_solved_calls
+                    if number_of_solved_calls > 0 else 0),
+                "maximum_subproblem_size": self.maximum_subproblem_size,
+                "average_number_of_conflicts": (
+                    self.total_number_of_conflicts / number_of_solved_calls
+                    if number_of_solved_calls > 0 else 0),
+                "maximum_number_of_conflicts": self.maximum_number_of_conflicts,
+                "number_of_calls_per_stage": self.number_of_calls_per_stage,
+                "number_of_mispricings": self.number_of_mispricings,
+                "last_reduced_cost": self.last_reduced_cost}
+
+    def print(self):
+        print("Pricing")
+        print("-------")
+        for key, value in self.to_dict().items():
+            label = (key[0].upper() + key[1:]).replace("_", " ") + ":"
+            if isinstance(value, float):
+                value = round(value, 3)
+            print(f"{label:<38}{value}")
+
+    def close(self):
+        if self.trace_file is not None:
+            self.trace_file.close()
+            self.trace_file = None
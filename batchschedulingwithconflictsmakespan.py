@@ -1,7 +1,28 @@
+import array
+import bisect
+import concurrent.futures
+import heapq
 import json
+import math
+import mmap
+import multiprocessing
+import os
+import queue
+import random
+import stat
+import struct
+import tempfile
+import threading
+import time
 import columngenerationsolverpy
+import columngenerationsolverpy.commons
+import columngenerationsolverpy.branching_scheme
 import treesearchsolverpy
 import knapsackwithwidthandconflicts
+import batchschedulinglowerbounds
+import batchschedulingpricingstatistics
+import batchschedulingdualstabilization
+import batchschedulingfreejobs
 
 
 class Job:
@@ -11,169 +32,2040 @@ class Job:
     conflicting_jobs = None
 
 
+# Binary instance format. All values are stored in native byte order:
+# - header: magic, version, number of jobs n, length m of the conflict
+#   neighbor array, batch capacity
+# - job processing times: n int64
+# - job sizes: n int64
+# - conflict offsets: n + 1 int64
+# - conflict neighbors: m int32
+BINARY_EXTENSION = ".bin"
+BINARY_MAGIC = b"BSWC"
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct("=4sIqqq")
+
+
+def typed_array(values):
+    # Array of int64, or of doubles if some values are not integers.
+    try:
+        return array.array('q', values)
+    except TypeError:
+        return array.array('d', values)
+
+
+class JobsView:
+    # Read-only sequence of jobs backed by the arrays of an instance. Job
+    # objects are built on access.
+
+    def __init__(self, instance):
+        self.instance = instance
+
+    def __len__(self):
+        return len(self.instance.processing_times)
+
+    def __getitem__(self, job_id):
+        if isinstance(job_id, slice):
+            return [self[j] for j in range(*job_id.indices(len(self)))]
+        if job_id < 0:
+            job_id += len(self)
+        if not 0 <= job_id < len(self):
+            raise IndexError("job index out of range")
+        instance = self.instance
+        instance.build_conflict_index()
+        job = Job()
+        job.id = job_id
+        job.processing_time = instance.processing_times[job_id]
+        job.size = instance.sizes[job_id]
+        job.conflicting_jobs = instance.conflict_neighbors[
+                instance.conflict_offsets[job_id]:
+                instance.conflict_offsets[job_id + 1]]
+        return job
+
+    def __iter__(self):
+        for job_id in range(len(self)):
+            yield self[job_id]
+
+
 class Instance:
 
     def __init__(self, filepath=None):
-        self.jobs = []
         self.batch_capacity = 1
-        if filepath is not None:
+        # Job attributes, indexed by job id.
+        self.processing_times = array.array('q')
+        self.sizes = array.array('q')
+        # Conflicts added by add_conflict, as a flat array of pairs of jobs.
+        self.conflicts = array.array('i')
+        # Conflict graph in CSR format: the conflicting jobs of job j are
+        # conflict_neighbors[conflict_offsets[j]:conflict_offsets[j + 1]],
+        # sorted by id. Built by build_conflict_index.
+        self.conflict_offsets = None
+        self.conflict_neighbors = None
+        self.mapped_file = None
+        self.jobs = JobsView(self)
+        if filepath is not None and filepath.endswith(BINARY_EXTENSION):
+            self.read_binary(filepath)
+        elif filepath is not None:
             with open(filepath) as json_file:
-                data = json.load(json_file)
-                self.batch_capacity = data["batch_capacity"]
-                jobs = zip(
-                        data["job_processing_times"],
-                        data["job_sizes"])
-                for (processing_time, size) in jobs:
-                    self.add_job(processing_time, size)
-                for job_id_1, job_id_2 in data["conflicts"]:
-                    self.add_conflict(job_id_1, job_id_2)
+                self.read_data(json.load(json_file))
+
+    def read_data(self, data):
+        # Read the content of a JSON instance file.
+        self.batch_capacity = data["batch_capacity"]
+        self.processing_times = typed_array(data["job_processing_times"])
+        self.sizes = typed_array(data["job_sizes"])
+        self.conflicts = array.array(
+                'i', (job_id
+                      for conflict in data["conflicts"]
+                      for job_id in conflict))
+        self.conflict_offsets = None
 
     def add_job(self, processing_time, size):
-        job = Job()
-        job.id = len(self.jobs)
-        job.processing_time = processing_time
-        job.size = size
-        job.conflicting_jobs = []
-        self.jobs.append(job)
+        if self.mapped_file is not None:
+            raise ValueError("Binary instances can't be modified.")
+        if self.processing_times.typecode == 'q' and not isinstance(processing_time, int):
+            self.processing_times = array.array('d', self.processing_times)
+        if self.sizes.typecode == 'q' and not isinstance(size, int):
+            self.sizes = array.array('d', self.sizes)
+        self.processing_times.append(processing_time)
+        self.sizes.append(size)
+        self.conflict_offsets = None
 
     def add_conflict(self, job_id_1, job_id_2):
-        self.jobs[job_id_1].conflicting_jobs.append(job_id_2)
-        self.jobs[job_id_2].conflicting_jobs.append(job_id_1)
+        if self.mapped_file is not None:
+            raise ValueError("Binary instances can't be modified.")
+        self.conflicts.append(job_id_1)
+        self.conflicts.append(job_id_2)
+        self.conflict_offsets = None
+
+    def build_conflict_index(self):
+        if self.conflict_offsets is not None:
+            return
+        # Bucket the arcs of the conflict graph by source, then sort and
+        # deduplicate each bucket in place.
+        number_of_jobs = len(self.processing_times)
+        sources = self.conflicts[0::2]
+        targets = self.conflicts[1::2]
+        offsets = array.array('q', [0]) * (number_of_jobs + 1)
+        for job_id_1, job_id_2 in zip(sources, targets):
+            if job_id_1 != job_id_2:
+                offsets[job_id_1 + 1] += 1
+                offsets[job_id_2 + 1] += 1
+        for job_id in range(number_of_jobs):
+            offsets[job_id + 1] += offsets[job_id]
+        neighbors = array.array('i', [0]) * offsets[number_of_jobs]
+        positions = offsets.tolist()
+        for job_id_1, job_id_2 in zip(sources, targets):
+            if job_id_1 != job_id_2:
+                neighbors[positions[job_id_1]] = job_id_2
+                positions[job_id_1] += 1
+                neighbors[positions[job_id_2]] = job_id_1
+                positions[job_id_2] += 1
+        end = 0
+        for job_id in range(number_of_jobs):
+            start = offsets[job_id]
+            offsets[job_id] = end
+            row = sorted(set(neighbors[start:offsets[job_id + 1]]))
+            neighbors[end:end + len(row)] = array.array('i', row)
+            end += len(row)
+        offsets[number_of_jobs] = end
+        del neighbors[end:]
+        self.conflict_offsets = offsets
+        self.conflict_neighbors = neighbors
+
+    def read_binary(self, filepath):
+        with open(filepath, 'rb') as binary_file:
+            self.mapped_file = mmap.mmap(
+                    binary_file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, number_of_jobs, number_of_neighbors, batch_capacity) \
+            = BINARY_HEADER.unpack_from(self.mapped_file)
+        if magic != BINARY_MAGIC or version != BINARY_VERSION:
+            raise ValueError(f"{filepath} is not a binary instance file.")
+        view = memoryview(self.mapped_file)
+        arrays = []
+        offset = BINARY_HEADER.size
+        for typecode, length in (
+                ('q', number_of_jobs),
+                ('q', number_of_jobs),
+                ('q', number_of_jobs + 1),
+                ('i', number_of_neighbors)):
+            end = offset + length * struct.calcsize(typecode)
+            arrays.append(view[offset:end].cast(typecode))
+            offset = end
+        processing_times, sizes, conflict_offsets, conflict_neighbors = arrays
+        self.batch_capacity = batch_capacity
+        self.processing_times = processing_times
+        self.sizes = sizes
+        self.conflicts = array.array('i')
+        self.conflict_offsets = conflict_offsets
+        self.conflict_neighbors = conflict_neighbors
+
+    def write_binary(self, filepath):
+        # The binary format only stores integers.
+        for name, values in (
+                ("batch capacity", [self.batch_capacity]),
+                ("processing times", self.processing_times),
+                ("sizes", self.sizes)):
+            if not all(isinstance(value, int) for value in values):
+                raise ValueError(
+                        f"The {name} of an instance must be integers to be "
+                        "written in the binary format.")
+        self.build_conflict_index()
+        processing_times = array.array('q', self.processing_times)
+        sizes = array.array('q', self.sizes)
+        with open(filepath, 'wb') as binary_file:
+            binary_file.write(BINARY_HEADER.pack(
+                BINARY_MAGIC,
+                BINARY_VERSION,
+                len(self.jobs),
+                len(self.conflict_neighbors),
+                self.batch_capacity))
+            binary_file.write(processing_times)
+            binary_file.write(sizes)
+            binary_file.write(array.array('q', self.conflict_offsets))
+            binary_file.write(array.array('i', self.conflict_neighbors))
+
+    def maximum_number_of_batches(self, makespan=float('inf')):
+        # Upper bound on the number of batches of a solution with a makespan
+        # of at most makespan, each batch containing a job and lasting at
+        # least the smallest processing time.
+        number_of_batches = len(self.processing_times)
+        minimum_processing_time = min(self.processing_times, default=0)
+        if minimum_processing_time > 0 and makespan != float('inf'):
+            number_of_batches = min(
+                    number_of_batches,
+                    math.floor(makespan / minimum_processing_time + 1e-6))
+        return number_of_batches
+
+    def conflicting(self, job_id_1, job_id_2):
+        self.build_conflict_index()
+        end = self.conflict_offsets[job_id_1 + 1]
+        pos = bisect.bisect_left(
+                self.conflict_neighbors,
+                job_id_2,
+                self.conflict_offsets[job_id_1],
+                end)
+        return pos < end and self.conflict_neighbors[pos] == job_id_2
 
     def write(self, filepath):
+        if filepath.endswith(BINARY_EXTENSION):
+            self.write_binary(filepath)
+            return
+        self.build_conflict_index()
+        offsets = self.conflict_offsets
+        neighbors = self.conflict_neighbors
+        conflicts = []
+        for job_id_1 in range(len(self.jobs)):
+            start = bisect.bisect_right(
+                    neighbors, job_id_1, offsets[job_id_1], offsets[job_id_1 + 1])
+            for job_id_2 in neighbors[start:offsets[job_id_1 + 1]]:
+                conflicts.append((job_id_1, job_id_2))
         data = {"batch_capacity": self.batch_capacity,
-                "job_processing_times": [job.processing_time
-                                         for job in self.jobs],
-                "job_sizes": [job.size for job in self.jobs],
-                "conflicts": [
-                    (job_1.id, job_2.id)
-                    for job_1 in self.jobs
-                    for job_2 in self.jobs
-                    if job_1.id in job_2.conflicting_jobs
-                    and job_1.id < job_2.id]}
+                "job_processing_times": self.processing_times.tolist(),
+                "job_sizes": self.sizes.tolist(),
+                "conflicts": conflicts}
         with open(filepath, 'w') as json_file:
             json.dump(data, json_file)
 
-    def check(self, filepath):
-        print("Checker")
-        print("-------")
-        with open(filepath) as json_file:
-            data = json.load(json_file)
+    def check_solution(self, batches):
+        self.build_conflict_index()
+        offsets = self.conflict_offsets
+        neighbors = self.conflict_neighbors
+        processing_times = self.processing_times
+        sizes = self.sizes
+        makespan = 0
+        number_of_overweighted_batches = 0
+        number_of_conflicts = 0
+        number_of_job_occurrences = 0
+        job_set = set()
+        for batch in batches:
             # Compute makespan.
-            makespan = sum(max(self.jobs[job_id].processing_time
-                               for job_id in batch)
-                           for batch in data["jobs"])
+            makespan += max((processing_times[job_id] for job_id in batch),
+                            default=0)
             # Compute number_of_overweighted_batches.
-            number_of_overweighted_batches = sum(
-                    sum(self.jobs[job_id].size for job_id in batch)
-                    > self.batch_capacity
-                    for batch in data["jobs"])
-            # Compute number_of_scheduled jobs and number_of_duplicates.
-            job_list = [job_id
-                        for batch in data["jobs"]
-                        for job_id in batch]
-            job_set = set(job_list)
-            number_of_scheduled_jobs = len(job_set)
-            number_of_duplicates = len(job_list) - len(job_set)
-            # Compute number_of_conflicts.
-            number_of_conflicts = sum(
-                    sum(
-                        job_id_1 in self.jobs[job_id_2].conflicting_jobs
-                        and job_id_1 < job_id_2
-                        for job_id_1 in batch
-                        for job_id_2 in batch)
-                    for batch in data["jobs"])
-
-            is_feasible = (
-                    (number_of_scheduled_jobs == len(self.jobs)) and
-                    (number_of_duplicates == 0) and
-                    (number_of_overweighted_batches == 0) and
-                    (number_of_conflicts == 0))
-            print(f"Makespan: {makespan}")
-            print(f"Number of scheduled jobs: {number_of_scheduled_jobs}")
-            print(f"Number of duplicates: {number_of_duplicates}")
+            if sum(sizes[job_id] for job_id in batch) > self.batch_capacity:
+                number_of_overweighted_batches += 1
+            number_of_job_occurrences += len(batch)
+            job_set.update(batch)
+            # Compute number_of_conflicts, looking either at the neighbors of
+            # each job or at the other jobs of the batch, whichever is
+            # smaller.
+            batch_set = set(batch)
+            for job_id in batch_set:
+                start = bisect.bisect_right(
+                        neighbors, job_id, offsets[job_id], offsets[job_id + 1])
+                end = offsets[job_id + 1]
+                if end - start <= len(batch_set):
+                    number_of_conflicts += sum(
+                            job_id_2 in batch_set
+                            for job_id_2 in neighbors[start:end])
+                else:
+                    number_of_conflicts += sum(
+                            job_id_2 > job_id
+                            and self.conflicting(job_id, job_id_2)
+                            for job_id_2 in batch_set)
+        # Compute number_of_scheduled jobs and number_of_duplicates.
+        number_of_scheduled_jobs = len(job_set)
+        number_of_duplicates = number_of_job_occurrences - len(job_set)
+
+        is_feasible = (
+                (number_of_scheduled_jobs == len(self.jobs)) and
+                (number_of_duplicates == 0) and
+                (number_of_overweighted_batches == 0) and
+                (number_of_conflicts == 0))
+        return {
+                "makespan": makespan,
+                "number_of_scheduled_jobs": number_of_scheduled_jobs,
+                "number_of_duplicates": number_of_duplicates,
+                "number_of_overweighted_batches": number_of_overweighted_batches,
+                "number_of_conflicts": number_of_conflicts,
+                "feasible": is_feasible}
+
+    def check(self, filepath, verbose=True):
+        with open(filepath) as json_file:
+            data = json.load(json_file)
+        report = self.check_solution(data["jobs"])
+        if verbose:
+            print("Checker")
+            print("-------")
+            print(f"Makespan: {report['makespan']}")
+            print(f"Number of scheduled jobs: {report['number_of_scheduled_jobs']}")
+            print(f"Number of duplicates: {report['number_of_duplicates']}")
             print(f"Number of overweighted batches: "
-                  f"{number_of_overweighted_batches}")
-            print(f"Number of conflicts: {number_of_conflicts}")
-            print(f"Feasible: {is_feasible}")
-            return (is_feasible, makespan)
+                  f"{report['number_of_overweighted_batches']}")
+            print(f"Number of conflicts: {report['number_of_conflicts']}")
+            print(f"Feasible: {report['feasible']}")
+            bound = batchschedulinglowerbounds.lower_bound(self)
+            _, relative_gap = batchschedulinglowerbounds.compute_gap(
+                    report["makespan"], bound)
+            print(f"Lower bound: {bound}")
+            print(f"Gap (%): {round(relative_gap, 2)}")
+        return (report["feasible"], report["makespan"])
+
+    def reduce(self, add_implicit_conflicts=True, maximum_number_of_partners=8):
+        # Return a Reduction of the instance:
+        # - A job j whose compatible jobs (not in conflict with j and fitting
+        #   with j in a batch) fit all together with j in a batch and have a
+        #   processing time smaller than or equal to the one of j, is
+        #   scheduled in a batch with them. Moving them from their batches to
+        #   the batch of j never increases the makespan. In particular, a job
+        #   with no compatible job is scheduled alone. Only the jobs with at
+        #   most maximum_number_of_partners compatible jobs are considered.
+        # - Pairs of jobs which don't fit together in a batch are added as
+        #   conflicts of the reduced instance if add_implicit_conflicts is
+        #   set, which tightens the conflict graph seen by the pricing and by
+        #   the lower bounds.
+        self.build_conflict_index()
+        offsets = self.conflict_offsets
+        neighbors = self.conflict_neighbors
+        capacity = self.batch_capacity
+        number_of_jobs = len(self.processing_times)
+        processing_times = self.processing_times
+        sizes = self.sizes
+        removed = bytearray(number_of_jobs)
+        reduction = Reduction(self)
+
+        # Fix batches until no more batch can be fixed. The numbers of
+        # compatible jobs are computed at the beginning of each pass and only
+        # overestimate the actual ones afterwards.
+        while True:
+            remaining = sorted(
+                    (job_id for job_id in range(number_of_jobs)
+                     if not removed[job_id]),
+                    key=lambda job_id: sizes[job_id])
+            remaining_sizes = [sizes[job_id] for job_id in remaining]
+            number_of_fixed_batches = len(reduction.fixed_batches)
+            for job_id in sorted(remaining,
+                                 key=lambda job_id: processing_times[job_id],
+                                 reverse=True):
+                if removed[job_id]:
+                    continue
+                free_capacity = capacity - sizes[job_id]
+                if free_capacity < 0:
+                    continue
+                # Number of jobs fitting with job_id.
+                end = bisect.bisect_right(remaining_sizes, free_capacity)
+                job_neighbors = neighbors[offsets[job_id]:offsets[job_id + 1]]
+                number_of_partners = (
+                        end
+                        - (sizes[job_id] <= free_capacity)
+                        - sum(not removed[j] and sizes[j] <= free_capacity
+                              for j in job_neighbors))
+                if number_of_partners > maximum_number_of_partners:
+                    continue
+                conflicting_jobs = set(job_neighbors)
+                partners = [
+                        j for j in remaining[:end]
+                        if j != job_id and not removed[j]
+                        and j not in conflicting_jobs]
+                if any(processing_times[j] > processing_times[job_id]
+                       for j in partners):
+                    continue
+                if sum(sizes[j] for j in partners) > free_capacity:
+                    continue
+                if any(self.conflicting(j1, j2)
+                       for pos, j1 in enumerate(partners)
+                       for j2 in partners[pos + 1:]):
+                    continue
+                batch = [job_id] + partners
+                for j in batch:
+                    removed[j] = 1
+                reduction.fixed_batches.append(batch)
+                reduction.fixed_makespan += processing_times[job_id]
+            if len(reduction.fixed_batches) == number_of_fixed_batches:
+                break
+
+        # Build the reduced instance.
+        reduced_instance = Instance()
+        reduced_instance.batch_capacity = capacity
+        new_ids = array.array('i', [-1]) * number_of_jobs
+        for job_id in range(number_of_jobs):
+            if removed[job_id]:
+                continue
+            new_ids[job_id] = len(reduction.original_job_ids)
+            reduction.original_job_ids.append(job_id)
+            reduced_instance.add_job(processing_times[job_id], sizes[job_id])
+        for job_id in reduction.original_job_ids:
+            start = bisect.bisect_right(
+                    neighbors, job_id, offsets[job_id], offsets[job_id + 1])
+            for j in neighbors[start:offsets[job_id + 1]]:
+                if not removed[j]:
+                    reduced_instance.add_conflict(new_ids[job_id], new_ids[j])
+        if add_implicit_conflicts:
+            by_size = sorted(
+                    range(len(reduction.original_job_ids)),
+                    key=lambda job_id: reduced_instance.sizes[job_id])
+            reduced_sizes = [reduced_instance.sizes[job_id]
+                             for job_id in by_size]
+            reduced_instance.build_conflict_index()
+            implicit_conflicts = []
+            for pos, job_id in enumerate(by_size):
+                # Jobs after job_id in by_size which don't fit with it.
+                start = max(
+                        pos + 1,
+                        bisect.bisect_right(
+                            reduced_sizes, capacity - reduced_sizes[pos]))
+                for j in by_size[start:]:
+                    if not reduced_instance.conflicting(job_id, j):
+                        implicit_conflicts.append((job_id, j))
+            for job_id, j in implicit_conflicts:
+                reduced_instance.add_conflict(job_id, j)
+            reduction.number_of_implicit_conflicts = len(implicit_conflicts)
+        reduced_instance.build_conflict_index()
+        reduction.instance = reduced_instance
+        return reduction
+
+
+class Reduction:
+    # Instance obtained with Instance.reduce. Job j of the reduced instance is
+    # job original_job_ids[j] of the original instance. The fixed batches,
+    # given with the original ids, are part of any solution of the original
+    # instance built from a solution of the reduced instance.
+
+    def __init__(self, original_instance):
+        self.original_instance = original_instance
+        self.instance = None
+        self.original_job_ids = []
+        self.fixed_batches = []
+        self.fixed_makespan = 0
+        self.number_of_implicit_conflicts = 0
+
+    def to_original(self, batches):
+        return (
+                [[self.original_job_ids[job_id] for job_id in batch]
+                 for batch in batches]
+                + [list(batch) for batch in self.fixed_batches])
+
+    def to_reduced(self, batches):
+        # Map a solution of the original instance to the reduced instance,
+        # dropping the jobs of the fixed batches.
+        reduced_ids = {job_id: reduced_id
+                       for reduced_id, job_id in enumerate(self.original_job_ids)}
+        return [[reduced_ids[job_id] for job_id in batch if job_id in reduced_ids]
+                for batch in batches]
+
+    def check_solution(self, batches):
+        return self.original_instance.check_solution(self.to_original(batches))
+
+    def print(self):
+        print("Reduction")
+        print("---------")
+        print(f"Number of jobs:                {len(self.original_instance.jobs)}")
+        print(f"Number of fixed batches:       {len(self.fixed_batches)}")
+        print(f"Number of fixed jobs:          "
+              f"{sum(len(batch) for batch in self.fixed_batches)}")
+        print(f"Fixed makespan:                {self.fixed_makespan}")
+        print(f"Number of remaining jobs:      {len(self.instance.jobs)}")
+        print(f"Number of implicit conflicts:  {self.number_of_implicit_conflicts}")
+
+
+def draw_values(rng, number_of_values, distribution, minimum, maximum):
+    # Draw integer values in [minimum, maximum]:
+    # - "uniform"
+    # - "normal": centered, standard deviation a sixth of the range
+    # - "exponential": mean a quarter of the range above the minimum
+    values = array.array('q')
+    if distribution == "uniform":
+        randint = rng.randint
+        values.extend(randint(minimum, maximum)
+                      for _ in range(number_of_values))
+    elif distribution == "normal":
+        gauss = rng.gauss
+        mu = (minimum + maximum) / 2
+        sigma = (maximum - minimum) / 6
+        values.extend(min(maximum, max(minimum, round(gauss(mu, sigma))))
+                      for _ in range(number_of_values))
+    elif distribution == "exponential":
+        expovariate = rng.expovariate
+        scale = max((maximum - minimum) / 4, 1)
+        values.extend(min(maximum, minimum + round(expovariate(1 / scale)))
+                      for _ in range(number_of_values))
+    else:
+        raise ValueError(f"Unknown distribution: {distribution}.")
+    return values
+
+
+def generate_instance(
+        filepath,
+        number_of_jobs,
+        conflict_density,
+        batch_capacity=1000,
+        processing_time_distribution="uniform",
+        processing_time_range=(100, 500),
+        size_distribution="uniform",
+        size_range=(100, 500),
+        seed=0,
+        chunk_size=1 << 20):
+    # Generate a random instance and write it to filepath + ".json" and
+    # filepath + BINARY_EXTENSION. Each pair of jobs is in conflict with
+    # probability conflict_density. The conflicts are streamed through a
+    # temporary file by chunks of chunk_size pairs, so that they are never all
+    # in memory.
+    rng = random.Random(seed)
+    processing_times = draw_values(
+            rng, number_of_jobs, processing_time_distribution,
+            *processing_time_range)
+    sizes = draw_values(
+            rng, number_of_jobs, size_distribution, *size_range)
+    degrees = array.array('q', [0]) * number_of_jobs
+
+    with tempfile.TemporaryFile() as pairs_file:
+        # Draw the conflicts, row by row. The gaps between two consecutive
+        # conflicts of a row follow a geometric distribution, so that the cost
+        # is proportional to the number of conflicts rather than to the
+        # number of pairs. Pairs are produced sorted.
+        chunk = array.array('i')
+        if conflict_density > 0:
+            log_q = (math.log(1 - conflict_density)
+                     if conflict_density < 1 else None)
+            for job_id_1 in range(number_of_jobs):
+                job_id_2 = job_id_1 + 1
+                if log_q is not None:
+                    job_id_2 += int(math.log(1.0 - rng.random()) / log_q)
+                while job_id_2 < number_of_jobs:
+                    chunk.append(job_id_1)
+                    chunk.append(job_id_2)
+                    degrees[job_id_1] += 1
+                    degrees[job_id_2] += 1
+                    if len(chunk) >= 2 * chunk_size:
+                        chunk.tofile(pairs_file)
+                        del chunk[:]
+                    job_id_2 += 1
+                    if log_q is not None:
+                        job_id_2 += int(math.log(1.0 - rng.random()) / log_q)
+        chunk.tofile(pairs_file)
+        del chunk[:]
+
+        def pair_chunks():
+            pairs_file.seek(0)
+            while True:
+                data = pairs_file.read(2 * chunk.itemsize * chunk_size)
+                if not data:
+                    break
+                chunk.frombytes(data)
+                yield chunk
+                del chunk[:]
+
+        # Write JSON file.
+        with open(filepath + ".json", 'w') as json_file:
+            json_file.write('{"batch_capacity": ' + json.dumps(batch_capacity))
+            json_file.write(', "job_processing_times": ')
+            json.dump(processing_times.tolist(), json_file)
+            json_file.write(', "job_sizes": ')
+            json.dump(sizes.tolist(), json_file)
+            json_file.write(', "conflicts": [')
+            separator = ""
+            for pairs in pair_chunks():
+                for k in range(0, len(pairs), 2):
+                    json_file.write(f"{separator}[{pairs[k]}, {pairs[k + 1]}]")
+                    separator = ", "
+            json_file.write(']}')
+
+        # Write binary file. The conflict neighbors are written in place
+        # through a memory map of the file.
+        conflict_offsets = array.array('q', [0])
+        for degree in degrees:
+            conflict_offsets.append(conflict_offsets[-1] + degree)
+        number_of_neighbors = conflict_offsets[-1]
+        with open(filepath + BINARY_EXTENSION, 'w+b') as binary_file:
+            binary_file.write(BINARY_HEADER.pack(
+                BINARY_MAGIC,
+                BINARY_VERSION,
+                number_of_jobs,
+                number_of_neighbors,
+                batch_capacity))
+            binary_file.write(processing_times)
+            binary_file.write(sizes)
+            binary_file.write(conflict_offsets)
+            neighbors_offset = binary_file.tell()
+            binary_file.truncate(neighbors_offset + 4 * number_of_neighbors)
+            binary_file.flush()
+            if number_of_neighbors == 0:
+                return
+            mapped_file = mmap.mmap(binary_file.fileno(), 0)
+            view = memoryview(mapped_file)
+            neighbors = view[neighbors_offset:].cast('i')
+            try:
+                # Next position of the neighbors of each job.
+                positions = conflict_offsets[:-1]
+                for pairs in pair_chunks():
+                    for k in range(0, len(pairs), 2):
+                        job_id_1 = pairs[k]
+                        job_id_2 = pairs[k + 1]
+                        neighbors[positions[job_id_1]] = job_id_2
+                        positions[job_id_1] += 1
+                        neighbors[positions[job_id_2]] = job_id_1
+                        positions[job_id_2] += 1
+            finally:
+                neighbors.release()
+                view.release()
+                mapped_file.close()
+
+
+class FirstFitTree:
+    # Segment tree over the batches storing their remaining capacities, used
+    # to find the first batch in which a job fits in logarithmic time. Batches
+    # which have not been opened yet have their full capacity.
+
+    def __init__(self, number_of_batches, batch_capacity):
+        self.size = 1
+        while self.size < max(number_of_batches, 1):
+            self.size *= 2
+        self.tree = [batch_capacity] * (2 * self.size)
+
+    def remaining_capacity(self, batch_id):
+        return self.tree[self.size + batch_id]
+
+    def find_first(self, start, size):
+        # Return the first batch starting from start with a remaining capacity
+        # of at least size, or -1.
+        if start >= self.size:
+            return -1
+        tree = self.tree
+        i = start + self.size
+        while True:
+            if tree[i] >= size:
+                while i < self.size:
+                    i = 2 * i if tree[2 * i] >= size else 2 * i + 1
+                return i - self.size
+            # Move to the next subtree on the right.
+            while i & 1:
+                i >>= 1
+            if i == 0:
+                return -1
+            i += 1
+
+    def add(self, batch_id, size):
+        tree = self.tree
+        i = batch_id + self.size
+        tree[i] -= size
+        i >>= 1
+        while i >= 1:
+            tree[i] = max(tree[2 * i], tree[2 * i + 1])
+            i >>= 1
+
+
+def assign_jobs(instance, next_job, number_of_jobs):
+    # Assign the jobs to batches in the order given by next_job, each job to
+    # the first batch in which it fits and which contains none of its
+    # conflicting jobs. next_job(batch_of) returns the next job to assign, and
+    # is called number_of_jobs times.
+    instance.build_conflict_index()
+    offsets = instance.conflict_offsets
+    neighbors = instance.conflict_neighbors
+    sizes = instance.sizes
+    batch_of = array.array('i', [-1]) * number_of_jobs
+    tree = FirstFitTree(number_of_jobs, instance.batch_capacity)
+    batches = []
+    # Jobs which don't fit in any batch, each alone in its batch.
+    oversized_batches = []
+    for _ in range(number_of_jobs):
+        job_id = next_job(batch_of)
+        size = sizes[job_id]
+        forbidden = set(batch_of[j] for j in neighbors[offsets[job_id]:offsets[job_id + 1]])
+        forbidden.discard(-1)
+        batch_id = tree.find_first(0, size)
+        while batch_id in forbidden:
+            batch_id = tree.find_first(batch_id + 1, size)
+        if batch_id == -1:
+            oversized_batches.append([job_id])
+            batch_of[job_id] = number_of_jobs + len(oversized_batches)
+            continue
+        tree.add(batch_id, size)
+        while len(batches) <= batch_id:
+            batches.append([])
+        batches[batch_id].append(job_id)
+        batch_of[job_id] = batch_id
+    return [batch for batch in batches if batch] + oversized_batches
+
+
+def first_fit_decreasing(instance):
+    # Jobs by decreasing processing time, so that the processing time of a
+    # batch is the one of its first job.
+    order = sorted(
+            range(len(instance.jobs)),
+            key=lambda job_id: (-instance.processing_times[job_id],
+                                -instance.sizes[job_id]))
+    iterator = iter(order)
+    return assign_jobs(
+            instance,
+            lambda batch_of: next(iterator),
+            len(order))
+
+
+def dsatur(instance):
+    # The next job is the one whose conflicting jobs are already in the
+    # largest number of distinct batches, then the longest one, then the one
+    # with the most conflicts.
+    instance.build_conflict_index()
+    offsets = instance.conflict_offsets
+    neighbors = instance.conflict_neighbors
+    number_of_jobs = len(instance.jobs)
+    processing_times = instance.processing_times
+    neighbor_batches = [None] * number_of_jobs
+    heap = [(0, -processing_times[job_id],
+             offsets[job_id] - offsets[job_id + 1], job_id)
+            for job_id in range(number_of_jobs)]
+    heapq.heapify(heap)
+    previous = [-1]
+
+    def next_job(batch_of):
+        # Update the saturation of the neighbors of the previous job.
+        job_id = previous[0]
+        if job_id != -1:
+            batch_id = batch_of[job_id]
+            for j in neighbors[offsets[job_id]:offsets[job_id + 1]]:
+                if batch_of[j] != -1:
+                    continue
+                if neighbor_batches[j] is None:
+                    neighbor_batches[j] = set()
+                if batch_id not in neighbor_batches[j]:
+                    neighbor_batches[j].add(batch_id)
+                    heapq.heappush(heap, (
+                        -len(neighbor_batches[j]),
+                        -processing_times[j],
+                        offsets[j] - offsets[j + 1],
+                        j))
+        # Pop the next job, skipping outdated entries.
+        while True:
+            saturation, _, _, job_id = heapq.heappop(heap)
+            if batch_of[job_id] != -1:
+                continue
+            if -saturation != len(neighbor_batches[job_id] or ()):
+                continue
+            previous[0] = job_id
+            return job_id
+
+    return assign_jobs(instance, next_job, number_of_jobs)
+
+
+class LocalSearch:
+    # Feasible solution with the structures needed to evaluate moves
+    # incrementally. Empty batches are kept and reused.
+
+    def __init__(self, instance, batches):
+        instance.build_conflict_index()
+        self.instance = instance
+        self.offsets = instance.conflict_offsets
+        self.neighbors = instance.conflict_neighbors
+        self.processing_times = instance.processing_times
+        self.sizes = instance.sizes
+        self.batch_of = array.array('i', [-1]) * len(instance.jobs)
+        self.batches = []
+        self.batch_sizes = []
+        self.batch_processing_times = []
+        self.empty_batches = []
+        for batch in batches:
+            if not batch:
+                continue
+            batch_id = len(self.batches)
+            self.batches.append(list(batch))
+            self.batch_sizes.append(sum(self.sizes[job_id] for job_id in batch))
+            self.batch_processing_times.append(
+                    max(self.processing_times[job_id] for job_id in batch))
+            for job_id in batch:
+                self.batch_of[job_id] = batch_id
+        self.makespan = sum(self.batch_processing_times)
+
+    def solution(self):
+        return [list(batch) for batch in self.batches if batch]
+
+    def number_of_conflicts(self, job_id, batch_id, ignored_job_id=-1):
+        # Number of jobs of batch_id, except ignored_job_id, conflicting with
+        # job_id. Look either at the neighbors of the job or at the jobs of the
+        # batch, whichever is smaller.
+        start = self.offsets[job_id]
+        end = self.offsets[job_id + 1]
+        batch = self.batches[batch_id]
+        if end - start <= len(batch):
+            batch_of = self.batch_of
+            return sum(batch_of[j] == batch_id and j != ignored_job_id
+                       for j in self.neighbors[start:end])
+        return sum(j != ignored_job_id and self.instance.conflicting(job_id, j)
+                   for j in batch)
+
+    def processing_time_without(self, batch_id, job_id):
+        processing_times = self.processing_times
+        return max((processing_times[j] for j in self.batches[batch_id]
+                    if j != job_id), default=0)
+
+    def new_batch(self):
+        while self.empty_batches:
+            batch_id = self.empty_batches.pop()
+            if not self.batches[batch_id]:
+                return batch_id
+        self.batches.append([])
+        self.batch_sizes.append(0)
+        self.batch_processing_times.append(0)
+        return len(self.batches) - 1
+
+    def remove(self, job_id):
+        batch_id = self.batch_of[job_id]
+        self.batches[batch_id].remove(job_id)
+        self.batch_sizes[batch_id] -= self.sizes[job_id]
+        processing_time = self.processing_time_without(batch_id, job_id)
+        self.makespan += processing_time - self.batch_processing_times[batch_id]
+        self.batch_processing_times[batch_id] = processing_time
+        if not self.batches[batch_id]:
+            self.empty_batches.append(batch_id)
+
+    def add(self, job_id, batch_id):
+        self.batches[batch_id].append(job_id)
+        self.batch_sizes[batch_id] += self.sizes[job_id]
+        processing_time = max(self.batch_processing_times[batch_id],
+                              self.processing_times[job_id])
+        self.makespan += processing_time - self.batch_processing_times[batch_id]
+        self.batch_processing_times[batch_id] = processing_time
+        self.batch_of[job_id] = batch_id
+
+    def relocate_delta(self, job_id, batch_id):
+        # Return the makespan variation of moving job_id to batch_id, or None
+        # if the move is infeasible.
+        source_id = self.batch_of[job_id]
+        if source_id == batch_id:
+            return None
+        if (
+                self.batch_sizes[batch_id] + self.sizes[job_id]
+                > self.instance.batch_capacity):
+            return None
+        if self.number_of_conflicts(job_id, batch_id) > 0:
+            return None
+        return (
+                self.processing_time_without(source_id, job_id)
+                - self.batch_processing_times[source_id]
+                + max(self.batch_processing_times[batch_id],
+                      self.processing_times[job_id])
+                - self.batch_processing_times[batch_id])
+
+    def relocate(self, job_id, batch_id):
+        self.remove(job_id)
+        self.add(job_id, batch_id)
+
+    def relocate_to_new_batch_delta(self, job_id):
+        # Return the makespan variation of moving job_id to a new batch, or
+        # None if it is already alone in its batch.
+        source_id = self.batch_of[job_id]
+        if len(self.batches[source_id]) == 1:
+            return None
+        return (
+                self.processing_time_without(source_id, job_id)
+                - self.batch_processing_times[source_id]
+                + self.processing_times[job_id])
+
+    def relocate_to_new_batch(self, job_id):
+        # The new batch is only allocated once the move has been accepted.
+        self.relocate(job_id, self.new_batch())
+
+    def swap_delta(self, job_id_1, job_id_2):
+        # Return the makespan variation of exchanging the batches of job_id_1
+        # and job_id_2, or None if the move is infeasible.
+        batch_id_1 = self.batch_of[job_id_1]
+        batch_id_2 = self.batch_of[job_id_2]
+        if batch_id_1 == batch_id_2:
+            return None
+        size_difference = self.sizes[job_id_2] - self.sizes[job_id_1]
+        capacity = self.instance.batch_capacity
+        if (
+                self.batch_sizes[batch_id_1] + size_difference > capacity
+                or self.batch_sizes[batch_id_2] - size_difference > capacity):
+            return None
+        if (
+                self.number_of_conflicts(job_id_1, batch_id_2, job_id_2) > 0
+                or self.number_of_conflicts(job_id_2, batch_id_1, job_id_1) > 0):
+            return None
+        processing_time_1 = max(
+                self.processing_time_without(batch_id_1, job_id_1),
+                self.processing_times[job_id_2])
+        processing_time_2 = max(
+                self.processing_time_without(batch_id_2, job_id_2),
+                self.processing_times[job_id_1])
+        return (
+                processing_time_1 - self.batch_processing_times[batch_id_1]
+                + processing_time_2 - self.batch_processing_times[batch_id_2])
+
+    def swap(self, job_id_1, job_id_2):
+        batch_id_1 = self.batch_of[job_id_1]
+        batch_id_2 = self.batch_of[job_id_2]
+        self.remove(job_id_1)
+        self.remove(job_id_2)
+        self.add(job_id_1, batch_id_2)
+        self.add(job_id_2, batch_id_1)
+
+    def merge_delta(self, batch_id_1, batch_id_2):
+        # Return the makespan variation of merging batch_id_2 into batch_id_1,
+        # or None if the move is infeasible.
+        if batch_id_1 == batch_id_2:
+            return None
+        if (
+                self.batch_sizes[batch_id_1] + self.batch_sizes[batch_id_2]
+                > self.instance.batch_capacity):
+            return None
+        if len(self.batches[batch_id_1]) < len(self.batches[batch_id_2]):
+            batch_id_1, batch_id_2 = batch_id_2, batch_id_1
+        for job_id in self.batches[batch_id_2]:
+            if self.number_of_conflicts(job_id, batch_id_1) > 0:
+                return None
+        return -min(self.batch_processing_times[batch_id_1],
+                    self.batch_processing_times[batch_id_2])
+
+    def merge(self, batch_id_1, batch_id_2):
+        for job_id in list(self.batches[batch_id_2]):
+            self.relocate(job_id, batch_id_1)
+
+
+def repair_solution(instance, batches):
+    # Return a feasible solution of the instance built from the given
+    # batches, for example a certificate of a previous version of the
+    # instance:
+    # - unknown and duplicated job ids are dropped
+    # - in each batch, the jobs are considered by decreasing processing time,
+    #   and the ones exceeding the capacity or in conflict with a job kept
+    #   before are removed from it
+    # - the removed jobs and the jobs missing from the batches are inserted,
+    #   by decreasing processing time, in the batch where they increase the
+    #   makespan the least, or in a new batch.
+    instance.build_conflict_index()
+    offsets = instance.conflict_offsets
+    neighbors = instance.conflict_neighbors
+    processing_times = instance.processing_times
+    sizes = instance.sizes
+    capacity = instance.batch_capacity
+    number_of_jobs = len(instance.jobs)
+    batch_of = array.array('i', [-1]) * number_of_jobs
+    repaired_batches = []
+    batch_sizes = []
+    batch_processing_times = []
+
+    def compatible(job_id, batch_id):
+        return (
+                batch_sizes[batch_id] + sizes[job_id] <= capacity
+                and all(batch_of[j] != batch_id
+                        for j in neighbors[offsets[job_id]:offsets[job_id + 1]]))
+
+    def add(job_id, batch_id):
+        if batch_id == len(repaired_batches):
+            repaired_batches.append([])
+            batch_sizes.append(0)
+            batch_processing_times.append(0)
+        repaired_batches[batch_id].append(job_id)
+        batch_sizes[batch_id] += sizes[job_id]
+        batch_processing_times[batch_id] = max(
+                batch_processing_times[batch_id], processing_times[job_id])
+        batch_of[job_id] = batch_id
+
+    for batch in batches:
+        batch_id = len(repaired_batches)
+        batch = [job_id for job_id in batch
+                 if isinstance(job_id, int) and 0 <= job_id < number_of_jobs]
+        for job_id in sorted(batch, key=lambda job_id: -processing_times[job_id]):
+            if batch_of[job_id] != -1:
+                continue
+            if batch_id == len(repaired_batches):
+                if sizes[job_id] <= capacity:
+                    add(job_id, batch_id)
+            elif compatible(job_id, batch_id):
+                add(job_id, batch_id)
+
+    missing_jobs = sorted(
+            (job_id for job_id in range(number_of_jobs)
+             if batch_of[job_id] == -1),
+            key=lambda job_id: -processing_times[job_id])
+    for job_id in missing_jobs:
+        best_batch_id = len(repaired_batches)
+        best_increase = processing_times[job_id]
+        for batch_id in range(len(repaired_batches)):
+            increase = max(
+                    0, processing_times[job_id] - batch_processing_times[batch_id])
+            if increase < best_increase and compatible(job_id, batch_id):
+                best_batch_id = batch_id
+                best_increase = increase
+                if increase == 0:
+                    break
+        add(job_id, best_batch_id)
+    return repaired_batches
+
+
+def read_solution(filepath):
+    with open(filepath) as json_file:
+        return json.load(json_file)["jobs"]
+
+
+def local_search(
+        instance,
+        batches,
+        time_limit=10,
+        maximum_number_of_iterations=float('inf'),
+        certificate_path=None,
+        seed=0,
+        lower_bound=float('-inf'),
+        new_solution_callback=None,
+        stop_event=None,
+        verbose=True):
+    # Improve a feasible solution with a simulated annealing over job
+    # relocations, job swaps and batch merges. Stop as soon as the makespan
+    # reaches lower_bound, or as soon as stop_event, an optional
+    # threading.Event, is set.
+    # If certificate_path is given, improving solutions are written to it,
+    # at most once per second, and the best solution is written at the end.
+    # new_solution_callback is called in the same way with a dictionary
+    # containing the time, the solution, its value and the lower bound.
+    start = time.time()
+    rng = random.Random(seed)
+    current = LocalSearch(instance, batches)
+    report = instance.check_solution(current.solution())
+    if not report["feasible"]:
+        raise ValueError("The initial solution of the local search is infeasible.")
+    number_of_jobs = len(instance.jobs)
+    output = {
+            "solution": current.solution(),
+            "solution_value": current.makespan,
+            "number_of_iterations": 0,
+            "number_of_improvements": 0}
+    if verbose:
+        print(f"Initial makespan: {current.makespan}")
+    if number_of_jobs < 2:
+        return output
+
+    best_makespan = current.makespan
+    # The best solution is only copied when the search is about to leave it,
+    # or when it is given to new_solution_callback.
+    best_saved = True
+    last_write = start
+
+    temperature = 0.1 * sum(current.processing_times) / number_of_jobs
+    while output["number_of_iterations"] < maximum_number_of_iterations:
+        if best_makespan <= lower_bound:
+            break
+        if output["number_of_iterations"] % 256 == 0 and (
+                time.time() - start > time_limit
+                or (stop_event is not None and stop_event.is_set())):
+            break
+        output["number_of_iterations"] += 1
+        temperature = max(temperature * 0.9999, 1e-3)
+
+        # Draw a move.
+        job_id_1 = rng.randrange(number_of_jobs)
+        job_id_2 = rng.randrange(number_of_jobs)
+        r = rng.random()
+        if r < 0.45:
+            if rng.random() < 0.05:
+                move = current.relocate_to_new_batch
+                arguments = (job_id_1,)
+                delta = current.relocate_to_new_batch_delta(*arguments)
+            else:
+                move = current.relocate
+                arguments = (job_id_1, current.batch_of[job_id_2])
+                delta = current.relocate_delta(*arguments)
+        elif r < 0.9:
+            move = current.swap
+            arguments = (job_id_1, job_id_2)
+            delta = current.swap_delta(*arguments)
+        else:
+            move = current.merge
+            arguments = (current.batch_of[job_id_1], current.batch_of[job_id_2])
+            delta = current.merge_delta(*arguments)
+        if delta is None:
+            continue
+        if delta > 0 and rng.random() >= math.exp(-delta / temperature):
+            continue
+
+        # Apply move.
+        if delta > 0 and not best_saved:
+            output["solution"] = current.solution()
+            best_saved = True
+        move(*arguments)
+        if current.makespan < best_makespan:
+            best_makespan = current.makespan
+            best_saved = False
+            output["number_of_improvements"] += 1
+            if new_solution_callback is not None:
+                output["solution"] = current.solution()
+                best_saved = True
+                new_solution_callback({
+                    "time": time.time() - start,
+                    "solution": output["solution"],
+                    "solution_value": best_makespan,
+                    "lower_bound": lower_bound})
+            # The certificate is written at most once per second.
+            if (
+                    certificate_path is not None
+                    and time.time() - last_write >= 1):
+                write_certificate(
+                        certificate_path, {"jobs": current.solution()})
+                last_write = time.time()
+
+    if not best_saved:
+        output["solution"] = current.solution()
+    output["solution_value"] = best_makespan
+    output["elapsed_time"] = time.time() - start
+    if certificate_path is not None:
+        write_certificate(certificate_path, {"jobs": output["solution"]})
+    if verbose:
+        print(f"Final makespan: {best_makespan}")
+        print(f"Number of iterations: {output['number_of_iterations']}")
+        print(f"Time: {output['elapsed_time']:.3f}")
+    return output
+
+
+def write_certificate(filepath, data):
+    # Write to a temporary file of the same directory and rename it, so that
+    # readers never see a partially written certificate.
+    directory = os.path.dirname(os.path.abspath(filepath))
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+            'w', dir=directory, suffix=".tmp", delete=False) as json_file:
+        try:
+            json.dump(data, json_file)
+        except BaseException:
+            # Don't leave the temporary file behind.
+            json_file.close()
+            os.unlink(json_file.name)
+            raise
+    try:
+        # The temporary file is only readable by its owner. Give it the mode
+        # of the certificate it replaces, or the default mode of new files.
+        try:
+            mode = stat.S_IMODE(os.stat(filepath).st_mode)
+        except FileNotFoundError:
+            umask = os.umask(0)
+            os.umask(umask)
+            mode = 0o666 & ~umask
+        os.chmod(json_file.name, mode)
+        os.replace(json_file.name, filepath)
+    except BaseException:
+        os.unlink(json_file.name)
+        raise
+
+
+def knapsack_branch_and_bound(
+        capacity,
+        sizes,
+        processing_times,
+        profits,
+        conflicts,
+        maximum_number_of_nodes=float('inf'),
+        maximum_number_of_solutions=1,
+        part=0,
+        number_of_parts=1,
+        deadline=float('inf'),
+        shared_best_value=None,
+        return_keys=False,
+        stop_event=None):
+    # Solve the knapsack problem with width and conflicts exactly: maximize
+    # the sum of the profits of the selected items minus the largest
+    # processing time of the selected items.
+    # conflicts[i] is a bitmask of the items conflicting with item i.
+    # Return the maximum_number_of_solutions best solutions with a positive
+    # value, best first, each given as a list of selected items. Among
+    # solutions of equal value, the first ones found are kept.
+    # The problem is split into number_of_parts independent parts according
+    # to the item with the largest processing time of the solution, and only
+    # the part-th one is solved.
+    # The search stops when maximum_number_of_nodes is reached, when
+    # time.time() exceeds deadline or when stop_event, an optional
+    # threading.Event, is set, and then returns the best solutions found so
+    # far, which may not be optimal.
+    # shared_best_value is an optional multiprocessing.Value shared by the
+    # parts solved in parallel. It holds the largest value a solution must
+    # reach to enter the pool of one of the parts, and the parts prune the
+    # nodes whose bound is below it. If return_keys is True, the solutions
+    # are returned as (key, solution) pairs, and the best solutions of all
+    # the parts are those of largest keys, as if the parts were solved by a
+    # single call.
+    # Removing an item with a non-positive profit from a solution never
+    # decreases its value, so these items are ignored.
+    order = sorted(
+            (i for i in range(len(sizes)) if profits[i] > 0),
+            key=lambda i: (-processing_times[i], -profits[i]))
+    number_of_items = len(order)
+    # Min-heap of (value, -pos_longest, -id, selected) of the best solutions
+    # found, so that the last found is removed first among equal values.
+    solution_pool = []
+    # Value a new solution must exceed to enter the pool.
+    best_value = 0
+    # Value of shared_best_value. The solutions of the other parts may be
+    # found later by a single call, so only solutions of smaller value are
+    # pruned with it.
+    shared_value = 0
+    number_of_nodes = 0
+    stopped = False
+
+    for pos_longest in range(part, number_of_items, number_of_parts):
+        longest = order[pos_longest]
+        if shared_best_value is not None:
+            shared_value = shared_best_value.value
+        # longest is the item with the largest processing time of the batch.
+        # Only items after it in the order can be added to the batch.
+        processing_time = processing_times[longest]
+        remaining_capacity = capacity - sizes[longest]
+        if remaining_capacity < 0:
+            continue
+        candidates = [
+                i for i in order[pos_longest + 1:]
+                if sizes[i] <= remaining_capacity
+                and not (conflicts[longest] >> i) & 1]
+        bound = (
+                profits[longest] - processing_time
+                + sum(profits[i] for i in candidates))
+        if bound <= best_value or bound < shared_value:
+            continue
+        candidates.sort(
+                key=lambda i: (profits[i] / sizes[i] if sizes[i] > 0
+                               else float('inf')),
+                reverse=True)
+        number_of_candidates = len(candidates)
+
+        stack = [(0, remaining_capacity, profits[longest],
+                  conflicts[longest], (longest, None), True)]
+        while stack:
+            pos, remaining, value, forbidden, selected, new = stack.pop()
+            number_of_nodes += 1
+            if number_of_nodes % 256 == 0:
+                if time.time() > deadline or (
+                        stop_event is not None and stop_event.is_set()):
+                    stopped = True
+                    break
+                if shared_best_value is not None:
+                    shared_value = shared_best_value.value
+            if number_of_nodes > maximum_number_of_nodes:
+                stopped = True
+                break
+
+            # Update solution pool. Only nodes created by adding an item hold
+            # a set of items which has not been seen yet.
+            if new and value - processing_time > best_value:
+                heapq.heappush(
+                        solution_pool,
+                        (value - processing_time, -pos_longest,
+                         -number_of_nodes, selected))
+                if len(solution_pool) > maximum_number_of_solutions:
+                    heapq.heappop(solution_pool)
+                if len(solution_pool) == maximum_number_of_solutions:
+                    best_value = solution_pool[0][0]
+                    if shared_best_value is not None:
+                        with shared_best_value.get_lock():
+                            if best_value > shared_best_value.value:
+                                shared_best_value.value = best_value
+
+            # Skip the items which can't be added anymore.
+            while pos < number_of_candidates and (
+                    (forbidden >> candidates[pos]) & 1
+                    or sizes[candidates[pos]] > remaining):
+                pos += 1
+            if pos == number_of_candidates:
+                continue
+
+            # Compute the fractional knapsack bound, ignoring conflicts
+            # between the remaining items.
+            bound = value - processing_time
+            c = remaining
+            for i in candidates[pos:]:
+                if (forbidden >> i) & 1:
+                    continue
+                if sizes[i] <= c:
+                    bound += profits[i]
+                    c -= sizes[i]
+                else:
+                    bound += profits[i] * c / sizes[i]
+                    break
+            if bound <= best_value or bound < shared_value:
+                continue
+
+            # Branch: first explore the child including the item, then the
+            # child excluding it.
+            i = candidates[pos]
+            stack.append((pos + 1, remaining, value, forbidden, selected,
+                          False))
+            stack.append((pos + 1, remaining - sizes[i], value + profits[i],
+                          forbidden | conflicts[i], (i, selected), True))
+
+        if stopped:
+            break
+
+    solutions = []
+    for value, pos_longest, node_id, selected in sorted(
+            solution_pool, reverse=True):
+        solution = []
+        while selected is not None:
+            solution.append(selected[0])
+            selected = selected[1]
+        if return_keys:
+            solutions.append(((value, pos_longest, node_id), solution))
+        else:
+            solutions.append(solution)
+    return solutions
+
+
+def knapsack_greedy(
+        capacity,
+        sizes,
+        processing_times,
+        profits,
+        conflicts,
+        number_of_starts=1):
+    # Insert the items by decreasing profit over size ratio, as long as they
+    # fit, are not in conflict with the selected items, and their profit
+    # exceeds the increase of the largest processing time of the selection.
+    # Each start begins with a different item among the best ratios.
+    # conflicts[i] is a bitmask of the items conflicting with item i. The
+    # items with a non-positive profit are ignored.
+    order = sorted(
+            (i for i in range(len(sizes)) if profits[i] > 0),
+            key=lambda i: (profits[i] / sizes[i] if sizes[i] > 0
+                           else float('inf')),
+            reverse=True)
+    solutions = []
+    for first in order[:number_of_starts]:
+        if sizes[first] > capacity:
+            continue
+        solution = [first]
+        remaining_capacity = capacity - sizes[first]
+        processing_time = processing_times[first]
+        forbidden = conflicts[first] | (1 << first)
+        for i in order:
+            if (forbidden >> i) & 1 or sizes[i] > remaining_capacity:
+                continue
+            if profits[i] <= processing_times[i] - processing_time:
+                continue
+            solution.append(i)
+            remaining_capacity -= sizes[i]
+            processing_time = max(processing_time, processing_times[i])
+            forbidden |= conflicts[i]
+        solutions.append(solution)
+    return solutions
+
+
+def knapsack_upper_bounds(capacity, sizes, processing_times, profits, conflicts):
+    # Upper bounds on the value of the knapsack problem of
+    # knapsack_branch_and_bound, and on the ratio between the profit of a
+    # solution and its largest processing time: for each choice of the item
+    # with the largest processing time, the fractional knapsack bound of the
+    # items after it which are not in conflict with it, ignoring the other
+    # conflicts.
+    # conflicts[i] is a bitmask of the items conflicting with item i. The
+    # items with a non-positive profit are in no optimal solution and are
+    # ignored.
+    items = [i for i in range(len(sizes)) if profits[i] > 0]
+    number_of_items = len(items)
+    order = sorted(items, key=lambda i: (-processing_times[i], -profits[i]))
+    positions = [0] * len(sizes)
+    for pos, i in enumerate(order):
+        positions[i] = pos
+    by_ratio = sorted(
+            items,
+            key=lambda i: (profits[i] / sizes[i] if sizes[i] > 0
+                           else float('inf')),
+            reverse=True)
+    # remaining_profits[pos] is the sum of the profits of the items after
+    # position pos in the order.
+    remaining_profits = [0] * (number_of_items + 1)
+    for pos in range(number_of_items - 1, 0, -1):
+        remaining_profits[pos - 1] = remaining_profits[pos] + profits[order[pos]]
+    best_bound = 0
+    best_ratio = 0
+    for pos_longest, longest in enumerate(order):
+        remaining_capacity = capacity - sizes[longest]
+        processing_time = processing_times[longest]
+        profit = profits[longest]
+        if remaining_capacity < 0:
+            continue
+        if (
+                profit + remaining_profits[pos_longest] - processing_time
+                <= best_bound
+                and profit + remaining_profits[pos_longest]
+                <= best_ratio * processing_time):
+            continue
+        forbidden = conflicts[longest]
+        for i in by_ratio:
+            if positions[i] <= pos_longest or (forbidden >> i) & 1:
+                continue
+            if sizes[i] <= remaining_capacity:
+                profit += profits[i]
+                remaining_capacity -= sizes[i]
+            else:
+                profit += profits[i] * remaining_capacity / sizes[i]
+                break
+        best_bound = max(best_bound, profit - processing_time)
+        if processing_time > 0:
+            best_ratio = max(best_ratio, profit / processing_time)
+        else:
+            best_ratio = float('inf')
+    return best_bound, best_ratio
+
+
+def conflict_bitmasks(number_of_items, conflicts):
+    masks = [0] * number_of_items
+    for i, j in conflicts:
+        masks[i] |= 1 << j
+        masks[j] |= 1 << i
+    return masks
+
+
+def shared_array(values):
+    # Copy of an array.array or of a memoryview in shared memory, which the
+    # pricing workers map instead of receiving a copy.
+    if isinstance(values, array.array):
+        typecode = values.typecode
+    else:
+        typecode = values.format
+    shared = multiprocessing.RawArray(typecode, len(values))
+    memoryview(shared).cast('B')[:] = memoryview(values).cast('B')
+    return shared
+
+
+# Data of a pricing worker process, set once when the process starts. Except
+# for the capacity, they are arrays in shared memory: the sizes, processing
+# times and conflict index of the jobs, the free jobs and the profits of the
+# current pricing call, which the PricingSolver writes before each call, and
+# the shared_best_value of the call. The worker also keeps the subproblem of
+# the free jobs it last built.
+pricing_worker = {}
+
+
+def initialize_pricing_worker(
+        batch_capacity, sizes, processing_times, conflict_offsets,
+        conflict_neighbors, free_jobs, profits, best_value):
+    pricing_worker["batch_capacity"] = batch_capacity
+    pricing_worker["sizes"] = sizes
+    pricing_worker["processing_times"] = processing_times
+    pricing_worker["conflict_offsets"] = conflict_offsets
+    pricing_worker["conflict_neighbors"] = conflict_neighbors
+    pricing_worker["free_jobs"] = free_jobs
+    pricing_worker["profits"] = profits
+    pricing_worker["best_value"] = best_value
+    pricing_worker["subproblem_id"] = None
+
+
+def solve_pricing_part(
+        subproblem_id, number_of_free_jobs, part, number_of_parts,
+        maximum_number_of_nodes, maximum_number_of_solutions, deadline):
+    # Solve a part of the branch-and-bound of a pricing call in a worker
+    # process. The subproblem is only built when the free jobs change.
+    w = pricing_worker
+    if w["subproblem_id"] != subproblem_id:
+        free_jobs = w["free_jobs"][:number_of_free_jobs]
+        positions = {job_id: i for i, job_id in enumerate(free_jobs)}
+        offsets = w["conflict_offsets"]
+        neighbors = w["conflict_neighbors"]
+        conflicts = [0] * number_of_free_jobs
+        for i, job_id in enumerate(free_jobs):
+            for j in neighbors[offsets[job_id]:offsets[job_id + 1]]:
+                j_ = positions.get(j)
+                if j_ is not None:
+                    conflicts[i] |= 1 << j_
+        w["subproblem_id"] = subproblem_id
+        w["sizes_kp"] = [w["sizes"][job_id] for job_id in free_jobs]
+        w["processing_times_kp"] = [
+                w["processing_times"][job_id] for job_id in free_jobs]
+        w["conflicts_kp"] = conflicts
+    return knapsack_branch_and_bound(
+            w["batch_capacity"],
+            w["sizes_kp"],
+            w["processing_times_kp"],
+            w["profits"][:number_of_free_jobs],
+            w["conflicts_kp"],
+            maximum_number_of_nodes,
+            maximum_number_of_solutions,
+            part,
+            number_of_parts,
+            deadline,
+            w["best_value"],
+            return_keys=True)
 
 
 class PricingSolver:
 
-    def __init__(self, instance):
+    def __init__(
+            self,
+            instance,
+            pricing_algorithm="beam_search",
+            trace_path=None,
+            number_of_processes=1):
         self.instance = instance
-        self.in_batch = None # (in_batch >> j) & 1 == 1 if object j is in a batch
+        # "beam_search", "branch_and_bound" or "cascade".
+        self.pricing_algorithm = pricing_algorithm
+        # Stages of the "cascade" pricing algorithm, as (algorithm, budget)
+        # pairs. A stage is only run if the previous ones found no column with
+        # a negative reduced cost, so that the last one is only run to prove
+        # the optimality of the linear relaxation.
+        self.pricing_stages = [
+                ("greedy", {"number_of_starts": 8}),
+                ("beam_search", {"size_of_the_queue": 16, "time_limit": 0.1}),
+                ("branch_and_bound", {}),
+                ]
+        # Node limit of the branch-and-bound; the returned column is only
+        # guaranteed optimal if it is not reached.
+        self.maximum_number_of_nodes = float('inf')
+        # Time, as given by time.time(), after which the pricing algorithms
+        # stop and return the best columns found so far, and solve_pricing
+        # returns no column, which ends the column generation. It is set by
+        # column_generation and by the tree searches from their time limits.
+        # stop_event is an optional threading.Event, set by the tree
+        # searches from their stop_event argument, whose setting has the same
+        # effect as reaching the deadline.
+        # interrupted tells if a pricing call of the current epoch was
+        # stopped by the deadline, in which case the value of the linear
+        # relaxation is not a valid bound.
+        self.deadline = float('inf')
+        self.stop_event = None
+        self.interrupted = False
+        # Maximum number of columns returned by a call to solve_pricing.
+        self.maximum_number_of_columns = 8
+        # Number of processes of the branch-and-bound. Its subproblems are
+        # split by job of largest processing time into
+        # number_of_parts_per_process parts per process, solved by a process
+        # pool created at the first call and kept until close is called.
+        # Subproblems with fewer than minimum_parallel_subproblem_size items
+        # of positive profit are solved in the current process.
+        self.number_of_processes = number_of_processes
+        self.number_of_parts_per_process = 4
+        self.minimum_parallel_subproblem_size = 64
+        self.pool = None
+        # Shared memory of the pool: free jobs, profits and
+        # shared_best_value of the current call, and id of the subproblem
+        # whose free jobs were last written.
+        self.pool_free_jobs = None
+        self.pool_profits = None
+        self.pool_best_value = None
+        self.pool_subproblem_id = None
+        # The column generation stops as soon as the gap between the value
+        # of the restricted master problem and the Lagrangian bound is at most
+        # absolute_gap_tolerance or relative_gap_tolerance percent.
+        self.absolute_gap_tolerance = 0
+        self.relative_gap_tolerance = 0
+        # Best Lagrangian bound of the current epoch, values of the
+        # restricted master problem and Lagrangian bounds of its pricing
+        # calls, and whether it stopped because of the gap tolerances.
+        self.lagrangian_bound = float('-inf')
+        self.bound_trajectory = []
+        self.gap_closed = False
+        # Start of the current epoch, for the times of bound_trajectory.
+        self.start = time.time()
+        # Columns generated so far, indexed by the frozenset of their jobs.
+        # It is kept between calls to initialize_pricing.
+        self.column_pool = {}
+        # Ids of the columns of the master problem, that is, of
+        # parameters.columns, which columngenerationsolverpy loads at each
+        # node. They are never returned again. number_of_master_columns is the
+        # number of columns of parameters.columns already added to the set.
+        self.master_column_ids = set()
+        self.number_of_master_columns = 0
+        instance.build_conflict_index()
+        number_of_jobs = len(instance.jobs)
+        self.in_batch = bytearray(number_of_jobs)  # in_batch[j] == 1 if job j is in a batch
+        # Number of fixed columns containing each job. With the set covering
+        # master, the fixed columns may overlap.
+        self.number_of_covering_columns = array.array('i', [0]) * number_of_jobs
+        # Ids of the fixed columns of the last call to initialize_pricing.
+        self.fixed_column_ids = set()
+        # Jobs which are not in a fixed column, by increasing id.
+        self.free_jobs = list(range(number_of_jobs))
+        # Buffers kept between calls to solve_pricing.
+        self.sizes = instance.sizes
+        self.processing_times = instance.processing_times
+        self.positions = array.array('i', [-1]) * number_of_jobs
+        # Subproblem of the free jobs, whose items are their positions in
+        # free_jobs: sizes, processing times, list of conflicts and bitmasks
+        # of the conflicts of each item. It only depends on the fixed columns
+        # and is built by build_subproblem at the first pricing call after
+        # they change. The pricing calls only differ by their profits.
+        # subproblem_id identifies it in the pricing workers.
+        self.subproblem_id = 0
+        self.subproblem_sizes = None
+        self.subproblem_processing_times = None
+        self.subproblem_conflict_pairs = None
+        self.subproblem_conflicts = None
+        self.statistics = batchschedulingpricingstatistics.PricingStatistics(
+                trace_path)
+        self.stabilization = batchschedulingdualstabilization.WentgesSmoothing()
 
     def initialize_pricing(self, columns, fixed_columns):
-        self.in_batch = 0
+        self.statistics.new_epoch()
+        self.stabilization.reset()
+        self.lagrangian_bound = float('-inf')
+        self.bound_trajectory = []
+        self.gap_closed = False
+        self.interrupted = False
+        self.start = time.time()
+        # columngenerationsolverpy only appends columns to parameters.columns.
+        for column in columns[self.number_of_master_columns:]:
+            self.master_column_ids.add(id(column))
+        self.number_of_master_columns = len(columns)
+        # Only update the jobs of the columns which have been unfixed or fixed
+        # since the previous call.
+        fixed_column_ids = set(column_id for column_id, _ in fixed_columns)
+        if fixed_column_ids == self.fixed_column_ids:
+            return
+        in_batch = self.in_batch
+        number_of_covering_columns = self.number_of_covering_columns
+        for variation, column_ids in (
+                (-1, self.fixed_column_ids - fixed_column_ids),
+                (1, fixed_column_ids - self.fixed_column_ids)):
+            for column_id in column_ids:
+                column = columns[column_id]
+                for row_index, row_coefficient in zip(column.row_indices, column.row_coefficients):
+                    if row_coefficient == 1:
+                        number_of_covering_columns[row_index] += variation
+                        in_batch[row_index] = (
+                                number_of_covering_columns[row_index] > 0)
+        self.fixed_column_ids = fixed_column_ids
+        self.free_jobs = batchschedulingfreejobs.free_jobs(in_batch)
+        self.subproblem_conflicts = None
 
-        for column_id, _ in fixed_columns:
-            column = columns[column_id]
-            for row_index, row_coefficient in zip(column.row_indices, column.row_coefficients):
-                if row_coefficient == 1:
-                    self.in_batch += (1 << row_index)
+    def deadline_reached(self):
+        return time.time() > self.deadline or (
+                self.stop_event is not None and self.stop_event.is_set())
 
     def solve_pricing(self, duals):
-        #print("Coucou")
-        # Build subproblem instance.
-        sizes = []
-        profits = []
-        processing_times = []
-        real_ids = []
-        reverse_ids = {}
-
-        counter = 0
-        for job_id, job in enumerate(self.instance.jobs):
-            profit = duals[job_id]
-            if profit <= 0:
+        if self.deadline_reached():
+            self.interrupted = True
+            return []
+
+        # Look for negative reduced cost columns in the column pool.
+        columns = self.pool_columns(duals)
+        if columns:
+            self.statistics.add_call(
+                    [columngenerationsolverpy.commons.compute_reduced_cost(
+                        column, duals)
+                     for column in columns],
+                    from_pool=True)
+            return self.add_to_master(columns, duals)
+
+        # The value of the restricted master problem is the sum of the duals
+        # of the free jobs. The Lagrangian bound of a point is the sum of its
+        # free duals plus a bound on the number of batches times a lower bound
+        # on the smallest reduced cost. The Farley bound of a point is the sum
+        # of its free duals divided by an upper bound on the ratio between the
+        # sum of the duals of a batch and its processing time, since the
+        # point divided by this ratio is dual feasible. The best of the two is
+        # kept.
+        free_jobs = self.free_jobs
+        lp_value = sum(duals[job_id] for job_id in free_jobs)
+        maximum_number_of_batches = min(
+                len(free_jobs),
+                self.instance.maximum_number_of_batches(lp_value))
+
+        # Solve the subproblem at the separation points of the dual
+        # stabilization until a column with a negative reduced cost for duals
+        # is found.
+        time_build = 0
+        time_solve = 0
+        number_of_mispricings = -1
+        for separation_duals in self.stabilization.separation_points(duals):
+            number_of_mispricings += 1
+            columns, info = self.solve_subproblem(separation_duals)
+            time_build += info["time_build"]
+            time_solve += info["time_solve"]
+            dual_sum = sum(separation_duals[job_id] for job_id in free_jobs)
+            bound = max(
+                    dual_sum
+                    + maximum_number_of_batches
+                    * min(0, info["minimum_reduced_cost"]),
+                    dual_sum / max(1, info["maximum_ratio"]))
+            self.lagrangian_bound = max(self.lagrangian_bound, bound)
+            self.stabilization.update(separation_duals, bound)
+            if info["interrupted"]:
+                break
+            if (
+                    separation_duals is not duals
+                    and any(columngenerationsolverpy.commons.compute_reduced_cost(
+                                column, duals)
+                            <= -columngenerationsolverpy.TOL
+                            for column in columns)):
+                columns.sort(key=lambda column: (
+                        columngenerationsolverpy.commons.compute_reduced_cost(
+                            column, duals)))
+                break
+
+        self.statistics.add_call(
+                [columngenerationsolverpy.commons.compute_reduced_cost(
+                    column, duals)
+                 for column in columns],
+                time_build=time_build,
+                time_solve=time_solve,
+                subproblem_size=info["subproblem_size"],
+                number_of_conflicts=info["number_of_conflicts"],
+                stage=info["stage"],
+                number_of_mispricings=number_of_mispricings)
+
+        self.bound_trajectory.append({
+                "time": time.time() - self.start,
+                "lp_value": lp_value,
+                "lagrangian_bound": self.lagrangian_bound})
+        absolute_gap, relative_gap = batchschedulinglowerbounds.compute_gap(
+                lp_value, self.lagrangian_bound)
+        if (
+                absolute_gap <= self.absolute_gap_tolerance
+                or relative_gap <= self.relative_gap_tolerance):
+            self.gap_closed = True
+            return []
+        return self.add_to_master(columns, duals)
+
+    def add_to_master(self, columns, duals):
+        # columngenerationsolverpy adds the returned columns with a negative
+        # reduced cost to the master problem.
+        for column in columns:
+            if (
+                    columngenerationsolverpy.commons.compute_reduced_cost(
+                        column, duals)
+                    <= -columngenerationsolverpy.TOL):
+                self.master_column_ids.add(id(column))
+                self.number_of_master_columns += 1
+        return columns
+
+    def build_subproblem(self):
+        self.subproblem_id += 1
+        free_jobs = self.free_jobs
+        positions = self.positions
+        for i, job_id in enumerate(free_jobs):
+            positions[job_id] = i
+        conflict_pairs = []
+        offsets = self.instance.conflict_offsets
+        neighbors = self.instance.conflict_neighbors
+        for i, job_id in enumerate(free_jobs):
+            # Only neighbors with a larger id, so that each conflict is added
+            # once.
+            start = bisect.bisect_right(
+                    neighbors, job_id, offsets[job_id], offsets[job_id + 1])
+            for j in neighbors[start:offsets[job_id + 1]]:
+                j_ = positions[j]
+                if j_ >= 0:
+                    conflict_pairs.append((i, j_))
+        for job_id in free_jobs:
+            positions[job_id] = -1
+        self.subproblem_sizes = [self.sizes[job_id] for job_id in free_jobs]
+        self.subproblem_processing_times = [
+                self.processing_times[job_id] for job_id in free_jobs]
+        self.subproblem_conflict_pairs = conflict_pairs
+        self.subproblem_conflicts = conflict_bitmasks(
+                len(free_jobs), conflict_pairs)
+
+    def solve_subproblem(self, duals):
+        # Return the best columns for the given duals, and the statistics of
+        # the subproblem.
+        # Build subproblem instance. The profits of the items are the duals
+        # of the free jobs; the items with a non-positive profit are ignored
+        # by the pricing algorithms.
+        start_time = time.time()
+        if self.subproblem_conflicts is None:
+            self.build_subproblem()
+        free_jobs = self.free_jobs
+        sizes = self.subproblem_sizes
+        processing_times = self.subproblem_processing_times
+        conflicts = self.subproblem_conflicts
+        profits = [duals[job_id] for job_id in free_jobs]
+        time_build = time.time() - start_time
+
+        # Solve subproblem instance, stopping at the first stage which finds
+        # a column with a negative reduced cost. The subproblem is skipped if
+        # its upper bound shows that there is no such column.
+        start_time = time.time()
+        maximum_value, maximum_ratio = knapsack_upper_bounds(
+                self.instance.batch_capacity,
+                sizes, processing_times, profits, conflicts)
+        minimum_reduced_cost = -maximum_value
+        columns = []
+        stage = None
+        stages = self.get_stages()
+        if minimum_reduced_cost > -columngenerationsolverpy.TOL:
+            stages = []
+        for stage, (algorithm, budget) in enumerate(stages):
+            solutions_kp = getattr(self, "solve_" + algorithm)(
+                    sizes, processing_times, profits, conflicts, **budget)
+
+            # Retrieve columns. Those already in the master problem are only
+            # used for the bound.
+            columns = []
+            for solution_kp in solutions_kp:
+                if not solution_kp:
+                    continue
+                column = self.get_column([free_jobs[i] for i in solution_kp])
+                if column not in columns:
+                    columns.append(column)
+            stage_minimum_reduced_cost = min(
+                    (columngenerationsolverpy.commons.compute_reduced_cost(
+                        column, duals)
+                     for column in columns),
+                    default=0)
+            columns = [
+                    column for column in columns
+                    if id(column) not in self.master_column_ids]
+            columns.sort(key=lambda column: (
+                    columngenerationsolverpy.commons.compute_reduced_cost(
+                        column, duals)))
+            columns = columns[:self.maximum_number_of_columns]
+            if (
+                    columns
+                    and columngenerationsolverpy.commons.compute_reduced_cost(
+                        columns[0], duals)
+                    <= -columngenerationsolverpy.TOL):
+                break
+            if self.deadline_reached():
+                break
+        interrupted = self.deadline_reached()
+        if interrupted:
+            self.interrupted = True
+        # The last stage gives the smallest reduced cost if it is exact and
+        # wasn't stopped by the deadline.
+        if (
+                stage == len(stages) - 1
+                and self.is_exact()
+                and not interrupted):
+            minimum_reduced_cost = max(
+                    minimum_reduced_cost, min(0, stage_minimum_reduced_cost))
+        time_solve = time.time() - start_time
+
+        return columns, {
+                "time_build": time_build,
+                "time_solve": time_solve,
+                "subproblem_size": sum(profit > 0 for profit in profits),
+                "number_of_conflicts": len(self.subproblem_conflict_pairs),
+                "stage": stage,
+                "minimum_reduced_cost": minimum_reduced_cost,
+                "maximum_ratio": maximum_ratio,
+                "interrupted": interrupted}
+
+    def get_column(self, batch):
+        # Return the column of the pool corresponding to the given jobs,
+        # creating it if necessary.
+        key = frozenset(batch)
+        column = self.column_pool.get(key)
+        if column is None:
+            column = columngenerationsolverpy.Column()
+            for job_id in sorted(batch):
+                column.row_indices.append(job_id)
+                column.row_coefficients.append(1)
+            column.objective_coefficient = max(
+                    self.processing_times[job_id] for job_id in batch)
+            self.column_pool[key] = column
+        return column
+
+    def pool_columns(self, duals):
+        # Return the columns of the pool which are not in the master problem,
+        # are compatible with the fixed columns and have a negative reduced
+        # cost, best first.
+        in_batch = self.in_batch
+        master_column_ids = self.master_column_ids
+        columns = []
+        for column in self.column_pool.values():
+            if id(column) in master_column_ids:
+                continue
+            if any(in_batch[job_id] for job_id in column.row_indices):
                 continue
-            if not((self.in_batch >> job_id) & 1):
-                profits.append(profit)
-                sizes.append(job.size)
-                processing_times.append(job.processing_time)
-                real_ids.append(job_id)
-                reverse_ids[job_id] = counter
-                counter += 1
-
-        # Solve subproblem instance.
-        n = len(sizes)
+            if (
+                    columngenerationsolverpy.commons.compute_reduced_cost(
+                        column, duals)
+                    <= -columngenerationsolverpy.TOL):
+                columns.append(column)
+        columns.sort(key=lambda column: (
+                columngenerationsolverpy.commons.compute_reduced_cost(
+                    column, duals)))
+        return columns[:self.maximum_number_of_columns]
+
+    def get_stages(self):
+        if self.pricing_algorithm == "cascade":
+            return self.pricing_stages
+        return [(self.pricing_algorithm, {})]
+
+    def is_exact(self):
+        # Return True if the pricing problem is solved to optimality, in which
+        # case the value of the linear relaxation is a valid lower bound. For
+        # the cascade, only the last stage needs to be exact since it is run
+        # whenever the previous ones fail.
+        algorithm, budget = self.get_stages()[-1]
+        return (
+                algorithm == "branch_and_bound"
+                and budget.get(
+                    "maximum_number_of_nodes",
+                    self.maximum_number_of_nodes) == float('inf'))
+
+    # The pricing algorithms take the items of the subproblem built by
+    # solve_subproblem and return the best solutions they found, as lists of
+    # items.
+
+    def solve_greedy(
+            self, sizes, processing_times, profits, conflicts,
+            number_of_starts=1):
+        return knapsack_greedy(
+                self.instance.batch_capacity,
+                sizes, processing_times, profits, conflicts,
+                number_of_starts)
+
+    def solve_beam_search(
+            self,
+            sizes,
+            processing_times,
+            profits,
+            conflicts,
+            size_of_the_queue=256,
+            time_limit=float('inf')):
+        # Only the items with a positive profit are given to the beam search,
+        # with the conflicts between them taken from the list of conflicts of
+        # the subproblem rather than from the bitmasks.
+        items = [i for i, profit in enumerate(profits) if profit > 0]
+        positions = [-1] * len(profits)
         knapsack_instance = knapsackwithwidthandconflicts.Instance()
         knapsack_instance.capacity = self.instance.batch_capacity
-        for i in range(n):
-            job = self.instance.jobs[real_ids[i]]
-            knapsack_instance.add_item(job.size, job.processing_time, profits[i])
-        for i in range(n):
-            job = self.instance.jobs[real_ids[i]]
-            for j in job.conflicting_jobs:
-                if j in reverse_ids:
-                    j_ = reverse_ids[j]
-                    if j_ > i:
-                        knapsack_instance.add_conflict(i, j_)
-        
+        for i_, i in enumerate(items):
+            positions[i] = i_
+            knapsack_instance.add_item(
+                    sizes[i], processing_times[i], profits[i])
+        for i, j in self.subproblem_conflict_pairs:
+            if positions[i] >= 0 and positions[j] >= 0:
+                knapsack_instance.add_conflict(positions[i], positions[j])
         branching_scheme = knapsackwithwidthandconflicts.BranchingScheme(knapsack_instance)
         output = treesearchsolverpy.iterative_beam_search(
                     branching_scheme,
                     verbose=False,
-                    minimum_size_of_the_queue=256,
-                    maximum_size_of_the_queue=256)
-        solution_kp = branching_scheme.to_solution(output["solution_pool"].best)
+                    minimum_size_of_the_queue=size_of_the_queue,
+                    maximum_size_of_the_queue=size_of_the_queue,
+                    maximum_pool_size=self.maximum_number_of_columns,
+                    time_limit=min(time_limit, self.deadline - time.time()))
+        return [[items[i_] for i_ in branching_scheme.to_solution(node)]
+                for node in output["solution_pool"].solutions]
+
+    def solve_branch_and_bound(
+            self,
+            sizes,
+            processing_times,
+            profits,
+            conflicts,
+            maximum_number_of_nodes=None):
+        if maximum_number_of_nodes is None:
+            maximum_number_of_nodes = self.maximum_number_of_nodes
+        if (
+                self.number_of_processes > 1
+                and sum(profit > 0 for profit in profits)
+                >= self.minimum_parallel_subproblem_size):
+            return self.solve_branch_and_bound_parallel(
+                    profits, maximum_number_of_nodes)
+        return knapsack_branch_and_bound(
+                self.instance.batch_capacity,
+                sizes, processing_times, profits, conflicts,
+                maximum_number_of_nodes,
+                self.maximum_number_of_columns,
+                deadline=self.deadline,
+                stop_event=self.stop_event)
 
-        # Retrieve column.
-        column = columngenerationsolverpy.Column()
-        max_proc_time = 0
-        for i in solution_kp:
-            job_id = real_ids[i]
-            column.row_indices.append(job_id)
-            column.row_coefficients.append(1)
-            max_proc_time = max(max_proc_time, self.instance.jobs[job_id].processing_time)
+    def solve_branch_and_bound_parallel(
+            self, profits, maximum_number_of_nodes):
+        # The workers read the free jobs and the profits from shared memory,
+        # and prune their searches with the best values of the other parts.
+        # The best solutions of all the parts are merged by key, which gives
+        # the solutions of the sequential branch-and-bound when the node
+        # limit and the deadline are not reached. The node limit is shared
+        # evenly between the parts. The parts don't see stop_event, and only
+        # stop at the deadline.
+        if self.pool is None:
+            instance = self.instance
+            number_of_jobs = len(instance.jobs)
+            self.pool_free_jobs = multiprocessing.RawArray('q', number_of_jobs)
+            self.pool_profits = multiprocessing.RawArray('d', number_of_jobs)
+            self.pool_best_value = multiprocessing.Value('d', 0)
+            self.pool_subproblem_id = None
+            self.pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.number_of_processes,
+                    initializer=initialize_pricing_worker,
+                    initargs=(
+                        instance.batch_capacity,
+                        shared_array(instance.sizes),
+                        shared_array(instance.processing_times),
+                        shared_array(instance.conflict_offsets),
+                        shared_array(instance.conflict_neighbors),
+                        self.pool_free_jobs,
+                        self.pool_profits,
+                        self.pool_best_value))
+        number_of_free_jobs = len(profits)
+        if self.pool_subproblem_id != self.subproblem_id:
+            self.pool_free_jobs[:number_of_free_jobs] = self.free_jobs
+            self.pool_subproblem_id = self.subproblem_id
+        self.pool_profits[:number_of_free_jobs] = profits
+        self.pool_best_value.value = 0
+        number_of_parts = (
+                self.number_of_processes * self.number_of_parts_per_process)
+        if maximum_number_of_nodes != float('inf'):
+            maximum_number_of_nodes = math.ceil(
+                    maximum_number_of_nodes / number_of_parts)
+        futures = [
+                self.pool.submit(
+                    solve_pricing_part,
+                    self.subproblem_id, number_of_free_jobs,
+                    part, number_of_parts,
+                    maximum_number_of_nodes, self.maximum_number_of_columns,
+                    self.deadline)
+                for part in range(number_of_parts)]
+        solutions = []
+        for future in futures:
+            solutions += future.result()
+        solutions.sort(reverse=True)
+        return [
+                solution
+                for _, solution in solutions[:self.maximum_number_of_columns]]
 
-        column.objective_coefficient = max_proc_time
-        
-        return [column]
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        self.statistics.close()
 
 
-def get_parameters(instance):
+def get_parameters(
+        instance,
+        pricing_algorithm="beam_search",
+        initial_batches=None,
+        trace_path=None,
+        number_of_processes=1,
+        smoothing_factor=0,
+        set_covering=False,
+        absolute_gap_tolerance=0,
+        relative_gap_tolerance=0,
+        column_pool=None):
+    # With set_covering, the master problem only requires each job to be in
+    # at least one batch. Its duals are non-negative, and to_solution removes
+    # the jobs covered more than once.
+    # column_pool is the column pool of a previous pricing solver of the same
+    # instance, reused and extended with the columns of initial_batches.
+    stabilization = batchschedulingdualstabilization.WentgesSmoothing(
+            smoothing_factor)
     number_of_constraints = len(instance.jobs)
     p = columngenerationsolverpy.Parameters(number_of_constraints)
     # Objective sense.
@@ -181,28 +2073,432 @@ def get_parameters(instance):
     # Column bounds.
     p.column_lower_bound = 0
     p.column_upper_bound = 1
-    # Row bounds.
-    for job in instance.jobs:
-        p.row_lower_bounds[job.id] = 1
-        p.row_upper_bounds[job.id] = 1
-        p.row_coefficient_lower_bounds[job.id] = 0
-        p.row_coefficient_upper_bounds[job.id] = 1
     # Dummy column objective coefficient.
-    p.dummy_column_objective_coefficient = 2 * max(job.processing_time for job in instance.jobs)
+    p.dummy_column_objective_coefficient = 2 * max(instance.processing_times)
+    # Row bounds.
+    row_upper_bound = 1
+    if set_covering:
+        # The linear programming solver doesn't accept infinite bounds. The
+        # solution made of the dummy columns of the rows costs
+        # number_of_constraints * dummy_column_objective_coefficient, and
+        # each column costs at least the smallest processing time, so a
+        # better solution doesn't cover a row more than this number of times.
+        # If a job has a zero processing time, the number of jobs is used
+        # instead, as in Instance.maximum_number_of_batches.
+        minimum_processing_time = min(instance.processing_times, default=0)
+        row_upper_bound = number_of_constraints
+        if minimum_processing_time > 0:
+            row_upper_bound = math.ceil(
+                    number_of_constraints * p.dummy_column_objective_coefficient
+                    / minimum_processing_time)
+    for job_id in range(number_of_constraints):
+        p.row_lower_bounds[job_id] = 1
+        p.row_upper_bounds[job_id] = row_upper_bound
+        p.row_coefficient_lower_bounds[job_id] = 0
+        p.row_coefficient_upper_bounds[job_id] = 1
 
     # Pricing solver.
-    p.pricing_solver = PricingSolver(instance)
+    p.pricing_solver = PricingSolver(
+            instance, pricing_algorithm, trace_path, number_of_processes)
+    p.pricing_solver.stabilization = stabilization
+    p.pricing_solver.absolute_gap_tolerance = absolute_gap_tolerance
+    p.pricing_solver.relative_gap_tolerance = relative_gap_tolerance
+    if column_pool is not None:
+        p.pricing_solver.column_pool = column_pool
+
+    # Initial columns.
+    if initial_batches is not None:
+        added_columns = set()
+        for batch in initial_batches:
+            if not batch:
+                continue
+            column = p.pricing_solver.get_column(batch)
+            if id(column) not in added_columns:
+                added_columns.add(id(column))
+                p.columns.append(column)
     return p
 
 
-def to_solution(columns, fixed_columns):
+def column_generation(parameters, **kwargs):
+    # Same as columngenerationsolverpy.column_generation, with the Lagrangian
+    # bound in output["lagrangian_bound"], and the values of the restricted
+    # master problem and Lagrangian bounds of the pricing calls in
+    # output["bound_trajectory"]. The time limit also applies to the pricing
+    # calls; if one of them is stopped by it, output["interrupted"] is True
+    # and output["solution_value"] is not a valid bound.
+    pricing_solver = parameters.pricing_solver
+    pricing_solver.deadline = time.time() + kwargs.get(
+            "time_limit", float('inf'))
+    try:
+        output = columngenerationsolverpy.column_generation(
+                parameters, **kwargs)
+    finally:
+        pricing_solver.deadline = float('inf')
+    output["interrupted"] = pricing_solver.interrupted
+    output["lagrangian_bound"] = parameters.pricing_solver.lagrangian_bound
+    output["bound_trajectory"] = parameters.pricing_solver.bound_trajectory
+    if kwargs.get("verbose", True):
+        print(f"Lagrangian bound:            {output['lagrangian_bound']}")
+    return output
+
+
+class BranchingScheme(columngenerationsolverpy.branching_scheme.BranchingScheme):
+    # Branching scheme of the limited discrepancy search of
+    # columngenerationsolverpy, with the lower bound used to stop the search
+    # as soon as the best solution found is optimal.
+    # The column generation of the nodes is run by columngenerationsolverpy
+    # without time limit, so the time limit is given to the pricing solver as
+    # a deadline: after it, the column generation of the current node stops
+    # at its next pricing call. The same goes for the stop_event argument, an
+    # optional threading.Event, after whose setting no node is expanded.
+
+    def __init__(self, parameters, **kwargs):
+        super().__init__(parameters, **kwargs)
+        self.instance = parameters.pricing_solver.instance
+        parameters.pricing_solver.deadline = self.start + kwargs.get(
+                "time_limit", float('inf'))
+        self.stop_event = kwargs.get("stop_event")
+        parameters.pricing_solver.stop_event = self.stop_event
+        self.lower_bound = kwargs.get("lower_bound", float('-inf'))
+        self.root_bound_trajectory = []
+        # Feasible solution, given as a list of batches, used as initial
+        # incumbent.
+        initial_solution = kwargs.get("initial_solution")
+        if initial_solution is not None:
+            self.output["solution"] = [
+                    (parameters.pricing_solver.get_column(batch), 1)
+                    for batch in initial_solution if batch]
+            self.output["solution_value"] = sum(
+                    column.objective_coefficient
+                    for column, _ in self.output["solution"])
+
+    def next_child(self, father):
+        if (
+                self.output["solution_value"] <= self.lower_bound
+                or (self.stop_event is not None
+                    and self.stop_event.is_set())):
+            father.next_child_pos = -2
+            return None
+        # The column generation of a node is run at the first call.
+        first_call = father.next_child_pos == -1
+        child = super().next_child(father)
+        # After the column generation at the root node, the Lagrangian bound
+        # is a valid bound. If the pricing is exact and the column generation
+        # wasn't stopped by the gap tolerances or by the deadline of the
+        # pricing, so is the value of the linear relaxation minus the number
+        # of batches times the tolerance on the reduced costs of
+        # columngenerationsolverpy, since the column generation stops as soon
+        # as no column has a reduced cost smaller than -TOL.
+        if father.depth == 0 and first_call:
+            pricing_solver = self.parameters.pricing_solver
+            self.root_bound_trajectory = pricing_solver.bound_trajectory
+            bound = pricing_solver.lagrangian_bound
+            lp_value = self.output["bound"]
+            if (
+                    pricing_solver.is_exact()
+                    and not pricing_solver.gap_closed
+                    and not pricing_solver.interrupted
+                    and lp_value != float('-inf')):
+                maximum_number_of_batches = min(
+                        len(self.instance.jobs),
+                        self.instance.maximum_number_of_batches(lp_value))
+                bound = max(
+                        bound,
+                        lp_value
+                        - maximum_number_of_batches
+                        * columngenerationsolverpy.TOL)
+            if bound != float('-inf'):
+                self.lower_bound = max(
+                        self.lower_bound,
+                        batchschedulinglowerbounds.round_bound(
+                            self.instance, bound))
+        return child
+
+
+def limited_discrepancy_search(parameters, **kwargs):
+    # Same as columngenerationsolverpy.limited_discrepancy_search, except that
+    # the search stops as soon as the best solution found reaches the lower
+    # bound, and that an initial solution can be given with the
+    # initial_solution argument. The lower bound is reported in
+    # output["lower_bound"], and the bound trajectory of the root node in
+    # output["bound_trajectory"].
+    # new_solution_callback is called with the initial solution and with each
+    # improving solution, with a dictionary containing the time, the
+    # solution, its value and the lower bound.
+    verbose = kwargs.get(
+            "verbose", True)
+    time_limit = kwargs.get(
+            "time_limit", float('inf'))
+    user_new_solution_callback = kwargs.get(
+            "new_solution_callback", None)
+
+    branching_scheme = BranchingScheme(parameters, **kwargs)
+
+    def emit():
+        if user_new_solution_callback is None:
+            return
+        # With the set covering master, removing the duplicated jobs may
+        # decrease the value of the solution.
+        solution = to_solution(
+                parameters.columns, branching_scheme.output["solution"])
+        user_new_solution_callback({
+            "time": time.time() - branching_scheme.start,
+            "solution": solution,
+            "solution_value": parameters.pricing_solver.instance.check_solution(
+                solution)["makespan"],
+            "lower_bound": branching_scheme.lower_bound})
+
+    if verbose:
+        print("Limited Discrepancy Search")
+        print("--------------------------")
+        print(f"Time limit:                  {time_limit}")
+        print(f"Lower bound:                 {branching_scheme.lower_bound}")
+        print(f"Initial solution value:      "
+              f"{branching_scheme.output['solution_value']}")
+        print()
+        print(
+                '{:>10}'.format("Time")
+                + '{:>14}'.format("Primal")
+                + '{:>14}'.format("Bound")
+                + '{:>14}'.format("Gap (%)"))
+        print(
+                '{:>10}'.format("----")
+                + '{:>14}'.format("------")
+                + '{:>14}'.format("-----")
+                + '{:>14}'.format("-------"))
+    if branching_scheme.output["solution"] is not None:
+        emit()
+
+    def new_solution_callback(output):
+        # The best solution of the tree search may be worse than the initial
+        # solution.
+        if (
+                output["solution_pool"].best.solution_value
+                >= branching_scheme.output["solution_value"]):
+            return
+        # Compute fixed_columns.
+        fixed_columns = []
+        node_tmp = output["solution_pool"].best
+        while node_tmp.father is not None:
+            if node_tmp.column_value != 0:
+                fixed_columns.append(
+                        (node_tmp.column_id, node_tmp.column_value))
+            node_tmp = node_tmp.father
+        branching_scheme.output["solution"] = [
+                (parameters.columns[column_id], value)
+                for column_id, value in fixed_columns]
+        branching_scheme.output["solution_value"] = \
+            output["solution_pool"].best.solution_value
+        if verbose:
+            primal = branching_scheme.output["solution_value"]
+            bound = branching_scheme.lower_bound
+            _, relative_gap = batchschedulinglowerbounds.compute_gap(
+                    primal, bound)
+            print(
+                    '{:>10.3f}'.format(time.time() - branching_scheme.start)
+                    + '{:>14f}'.format(primal)
+                    + '{:>14f}'.format(bound)
+                    + '{:>14.2f}'.format(relative_gap))
+        emit()
+
+    try:
+        treesearchsolverpy.best_first_search(
+                branching_scheme,
+                new_solution_callback=new_solution_callback,
+                time_limit=time_limit,
+                verbose=False)
+    finally:
+        parameters.pricing_solver.deadline = float('inf')
+        parameters.pricing_solver.stop_event = None
+
+    output = branching_scheme.output
+    output["elapsed_time"] = time.time() - branching_scheme.start
+    output["lower_bound"] = branching_scheme.lower_bound
+    output["bound_trajectory"] = branching_scheme.root_bound_trajectory
+    if verbose:
+        print()
+        print(f"Solution value:              {output['solution_value']}")
+        print(f"Lower bound:                 {output['lower_bound']}")
+        print("Time:" + " " * 24 + '{:<11.3f}'.format(output["elapsed_time"]))
+    return output
+
+
+def greedy(parameters, **kwargs):
+    # Same as columngenerationsolverpy.greedy, except that the time_limit
+    # argument is taken into account: the greedy is run as a limited
+    # discrepancy search with a maximum discrepancy of 0. Takes the same
+    # arguments as limited_discrepancy_search.
+    kwargs["maximum_discrepancy"] = 0
+    return limited_discrepancy_search(parameters, **kwargs)
+
+
+HEURISTICS = {
+        "first_fit_decreasing": first_fit_decreasing,
+        "dsatur": dsatur,
+        }
+
+
+def solve(
+        instance,
+        algorithm="limited_discrepancy_search",
+        pricing_algorithm="beam_search",
+        time_limit=float('inf'),
+        initial_solution=None,
+        new_solution_callback=None,
+        number_of_pricing_processes=1,
+        smoothing_factor=0,
+        set_covering=False,
+        absolute_gap_tolerance=0,
+        relative_gap_tolerance=0,
+        stop_event=None,
+        verbose=False):
+    # Solve the instance with one of the algorithms of the command line and
+    # return the best solution found. initial_solution is repaired and used
+    # as warm start. new_solution_callback is called with each improving
+    # solution, with a dictionary containing the time since the start, the
+    # solution, its value and the lower bound. The search stops soon after
+    # stop_event, an optional threading.Event, is set.
+    start = time.time()
+    lower_bound = batchschedulinglowerbounds.lower_bound(instance)
+    best = {"solution": None, "solution_value": float('inf')}
+
+    def update(solution_info):
+        if solution_info["solution_value"] >= best["solution_value"]:
+            return
+        best["solution"] = solution_info["solution"]
+        best["solution_value"] = solution_info["solution_value"]
+        if new_solution_callback is not None:
+            new_solution_callback({
+                "time": time.time() - start,
+                "solution": solution_info["solution"],
+                "solution_value": solution_info["solution_value"],
+                "lower_bound": max(lower_bound, solution_info["lower_bound"])})
+
+    def update_with(solution):
+        update({
+            "solution": solution,
+            "solution_value": instance.check_solution(solution)["makespan"],
+            "lower_bound": lower_bound})
+
+    if initial_solution is not None:
+        initial_solution = repair_solution(instance, initial_solution)
+        update_with(initial_solution)
+    if algorithm in HEURISTICS:
+        update_with(HEURISTICS[algorithm](instance))
+    elif algorithm == "local_search":
+        if initial_solution is None:
+            initial_solution = first_fit_decreasing(instance)
+            update_with(initial_solution)
+        local_search(
+                instance,
+                initial_solution,
+                time_limit=time_limit,
+                lower_bound=lower_bound,
+                new_solution_callback=update,
+                stop_event=stop_event,
+                verbose=verbose)
+    elif algorithm in ("greedy", "limited_discrepancy_search"):
+        parameters = get_parameters(
+                instance, pricing_algorithm, initial_solution,
+                number_of_processes=number_of_pricing_processes,
+                smoothing_factor=smoothing_factor,
+                set_covering=set_covering,
+                absolute_gap_tolerance=absolute_gap_tolerance,
+                relative_gap_tolerance=relative_gap_tolerance)
+        try:
+            if algorithm == "greedy":
+                greedy(
+                        parameters,
+                        time_limit=time_limit,
+                        lower_bound=lower_bound,
+                        initial_solution=initial_solution,
+                        new_solution_callback=update,
+                        stop_event=stop_event,
+                        verbose=verbose)
+            else:
+                limited_discrepancy_search(
+                        parameters,
+                        time_limit=time_limit,
+                        lower_bound=lower_bound,
+                        initial_solution=initial_solution,
+                        new_solution_callback=update,
+                        stop_event=stop_event,
+                        verbose=verbose)
+        finally:
+            parameters.pricing_solver.close()
+    else:
+        raise ValueError(f"Unknown algorithm: {algorithm}.")
+    return best
+
+
+class AnytimeSolutionsClosed(Exception):
+    # Raised in the solving thread of anytime_solutions to stop it once the
+    # generator has been closed or abandoned.
+    pass
+
+
+def anytime_solutions(instance, **kwargs):
+    # Generator over the improving solutions of solve, run in a separate
+    # thread, yielded as soon as they are found. Takes the same arguments as
+    # solve, except new_solution_callback and stop_event. If the generator is
+    # closed before the end, its stop event is set and the thread stops soon
+    # after, without reporting another solution.
+    solutions = queue.Queue()
+    end = object()
+    error = []
+    stop = threading.Event()
+
+    def new_solution_callback(solution_info):
+        if stop.is_set():
+            raise AnytimeSolutionsClosed()
+        solutions.put(solution_info)
+
+    def run():
+        try:
+            solve(instance, new_solution_callback=new_solution_callback,
+                  stop_event=stop, **kwargs)
+        except AnytimeSolutionsClosed:
+            pass
+        except Exception as e:
+            error.append(e)
+        finally:
+            solutions.put(end)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    try:
+        while True:
+            solution_info = solutions.get()
+            if solution_info is end:
+                break
+            yield solution_info
+    finally:
+        stop.set()
+    thread.join()
+    if error:
+        raise error[0]
+
+
+def to_solution(columns, fixed_columns, reduction=None):
+    # If the columns are those of a reduced instance, the returned solution
+    # is the corresponding solution of the original instance.
+    # With the set covering master, a job may be in several batches. It is
+    # only kept in the one with the largest processing time, so that removing
+    # it from the others never increases their processing times.
     solution = []
-    for column, _ in fixed_columns:
+    covered = set()
+    for column, _ in sorted(
+            fixed_columns,
+            key=lambda fixed_column: -fixed_column[0].objective_coefficient):
         s = []
         for index, coef in zip(column.row_indices, column.row_coefficients):
-            if coef == 1:
+            if coef == 1 and index not in covered:
+                covered.add(index)
                 s.append(index)
-        solution.append(s)
+        if s:
+            solution.append(s)
+    if reduction is not None:
+        solution = reduction.to_original(solution)
     return solution
 
 
@@ -224,15 +2520,153 @@ if __name__ == "__main__":
             type=str,
             default="AMOP-Batch-scheduling/certificate.json",
             help='')
+    parser.add_argument(
+            "-o", "--output",
+            type=str,
+            default=None,
+            help='output instance file of the converter, output file '
+            'prefix of the streaming generator')
+    parser.add_argument(
+            "--number-of-jobs",
+            type=int,
+            default=1000,
+            help='')
+    parser.add_argument(
+            "--conflict-density",
+            type=float,
+            default=0.1,
+            help='probability of each pair of jobs to be in conflict')
+    parser.add_argument(
+            "--batch-capacity",
+            type=int,
+            default=1000,
+            help='')
+    parser.add_argument(
+            "--processing-times",
+            type=int,
+            nargs=2,
+            default=[100, 500],
+            help='minimum and maximum processing time')
+    parser.add_argument(
+            "--processing-time-distribution",
+            type=str,
+            default="uniform",
+            help='uniform, normal or exponential')
+    parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs=2,
+            default=[100, 500],
+            help='minimum and maximum size')
+    parser.add_argument(
+            "--size-distribution",
+            type=str,
+            default="uniform",
+            help='uniform, normal or exponential')
+    parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help='')
+    parser.add_argument(
+            "-p", "--pricing-algorithm",
+            type=str,
+            default="beam_search",
+            help='beam_search, branch_and_bound or cascade')
+    parser.add_argument(
+            "--initial-heuristic",
+            type=str,
+            default=None,
+            help='first_fit_decreasing or dsatur, used to provide initial '
+            'columns to the column generation')
+    parser.add_argument(
+            "-t", "--time-limit",
+            type=float,
+            default=None,
+            help='')
+    parser.add_argument(
+            "--initial-certificate",
+            type=str,
+            default=None,
+            help='initial solution of the local search')
+    parser.add_argument(
+            "--local-search-time-limit",
+            type=float,
+            default=0,
+            help='time spent improving the solution of the column generation '
+            'heuristics with the local search')
+    parser.add_argument(
+            "--pricing-trace",
+            type=str,
+            default=None,
+            help='file where the statistics of each pricing call are written')
+    parser.add_argument(
+            "-j", "--pricing-processes",
+            type=int,
+            default=1,
+            help='number of processes of the branch-and-bound pricing')
+    parser.add_argument(
+            "--smoothing-factor",
+            type=float,
+            default=0,
+            help='Wentges smoothing factor of the dual stabilization, between '
+            '0 (disabled) and 1')
+    parser.add_argument(
+            "--set-covering",
+            action='store_true',
+            help='use a set covering master problem instead of a set '
+            'partitioning one')
+    parser.add_argument(
+            "--absolute-gap-tolerance",
+            type=float,
+            default=0,
+            help='stop the column generation when the gap between the linear '
+            'relaxation and the Lagrangian bound is at most this value')
+    parser.add_argument(
+            "--relative-gap-tolerance",
+            type=float,
+            default=0,
+            help='same as --absolute-gap-tolerance, in percent')
+    parser.add_argument(
+            "-w", "--warm-start",
+            type=str,
+            default=None,
+            help='certificate of a previous solve, repaired if needed, used '
+            'as initial columns and as initial solution')
+    parser.add_argument(
+            "--reduce",
+            action='store_true',
+            help='preprocess the instance before the column generation')
 
     args = parser.parse_args()
+    if (
+            args.algorithm in ("converter", "streaming_generator")
+            and args.output is None):
+        parser.error(f"the {args.algorithm} requires -o/--output")
 
     if args.algorithm == "checker":
         instance = Instance(args.instance)
         instance.check(args.certificate)
 
+    elif args.algorithm == "converter":
+        # Convert between the JSON and the binary formats depending on the
+        # file extensions.
+        instance = Instance(args.instance)
+        instance.write(args.output)
+
+    elif args.algorithm == "streaming_generator":
+        generate_instance(
+                args.output,
+                args.number_of_jobs,
+                args.conflict_density,
+                batch_capacity=args.batch_capacity,
+                processing_time_distribution=args.processing_time_distribution,
+                processing_time_range=args.processing_times,
+                size_distribution=args.size_distribution,
+                size_range=args.sizes,
+                seed=args.seed)
+
     elif args.algorithm == "generator":
-        import random
         random.seed(0)
         for number_of_jobs in range(101):
             instance = Instance()
@@ -258,24 +2692,135 @@ if __name__ == "__main__":
             instance.write(
                     args.instance + "_" + str(number_of_jobs) + ".json")
 
-    elif args.algorithm == "column_generation":
+    elif args.algorithm in HEURISTICS:
         instance = Instance(args.instance)
-        output = columngenerationsolverpy.column_generation(
-                get_parameters(instance))
+        solution = HEURISTICS[args.algorithm](instance)
+        if args.certificate is not None:
+            write_certificate(args.certificate, {"jobs": solution})
+            instance.check(args.certificate)
 
-    else:
+    elif args.algorithm == "local_search":
         instance = Instance(args.instance)
-        parameters = get_parameters(instance)
-        if args.algorithm == "greedy":
-            output = columngenerationsolverpy.greedy(
-                    parameters)
-        elif args.algorithm == "limited_discrepancy_search":
-            output = columngenerationsolverpy.limited_discrepancy_search(
-                    parameters)
-        solution = to_solution(parameters.columns, output["solution"])
+        if args.initial_certificate is not None:
+            batches = repair_solution(
+                    instance, read_solution(args.initial_certificate))
+        else:
+            batches = first_fit_decreasing(instance)
+        local_search(
+                instance,
+                batches,
+                time_limit=(args.time_limit
+                            if args.time_limit is not None else 10),
+                certificate_path=args.certificate,
+                lower_bound=batchschedulinglowerbounds.lower_bound(instance))
         if args.certificate is not None:
-            data = {"jobs": solution}
-            with open(args.certificate, 'w') as json_file:
-                json.dump(data, json_file)
             print()
             instance.check(args.certificate)
+
+    elif args.algorithm == "column_generation":
+        instance = Instance(args.instance)
+        if args.reduce:
+            reduction = instance.reduce()
+            reduction.print()
+            print()
+            instance = reduction.instance
+        # If the instance is reduced, the value of the linear relaxation
+        # doesn't include the fixed makespan.
+        if instance.jobs:
+            initial_batches = None
+            if args.initial_heuristic is not None:
+                initial_batches = HEURISTICS[args.initial_heuristic](instance)
+            parameters = get_parameters(
+                    instance, args.pricing_algorithm, initial_batches,
+                    args.pricing_trace, args.pricing_processes,
+                    args.smoothing_factor, args.set_covering,
+                    args.absolute_gap_tolerance, args.relative_gap_tolerance)
+            output = column_generation(parameters)
+            print()
+            parameters.pricing_solver.statistics.print()
+            parameters.pricing_solver.close()
+
+    else:
+        original_instance = Instance(args.instance)
+        instance = original_instance
+        reduction = None
+        if args.reduce:
+            reduction = original_instance.reduce()
+            reduction.print()
+            print()
+            instance = reduction.instance
+        if not instance.jobs:
+            # All the jobs are in fixed batches.
+            solution = []
+        else:
+            initial_batches = []
+            if args.initial_heuristic is not None:
+                initial_batches += HEURISTICS[args.initial_heuristic](instance)
+            warm_start = None
+            if args.warm_start is not None:
+                warm_start = read_solution(args.warm_start)
+                if reduction is not None:
+                    warm_start = reduction.to_reduced(warm_start)
+                warm_start = repair_solution(instance, warm_start)
+                initial_batches += warm_start
+
+            # Write each improving solution to the certificate as soon as it
+            # is found, so that the best solution so far is available if the
+            # run is interrupted.
+            def new_solution_callback(solution_info):
+                if args.certificate is None:
+                    return
+                solution = solution_info["solution"]
+                if reduction is not None:
+                    solution = reduction.to_original(solution)
+                write_certificate(args.certificate, {"jobs": solution})
+
+            parameters = get_parameters(
+                    instance, args.pricing_algorithm, initial_batches,
+                    args.pricing_trace, args.pricing_processes,
+                    args.smoothing_factor, args.set_covering,
+                    args.absolute_gap_tolerance, args.relative_gap_tolerance)
+            if args.algorithm == "greedy":
+                search = greedy
+            elif args.algorithm == "limited_discrepancy_search":
+                search = limited_discrepancy_search
+            else:
+                raise ValueError(f"Unknown algorithm: {args.algorithm}.")
+            output = search(
+                    parameters,
+                    time_limit=(args.time_limit
+                                if args.time_limit is not None
+                                else float('inf')),
+                    lower_bound=batchschedulinglowerbounds.lower_bound(instance),
+                    initial_solution=warm_start,
+                    new_solution_callback=new_solution_callback)
+            print()
+            parameters.pricing_solver.statistics.print()
+            parameters.pricing_solver.close()
+            if output["solution"] is not None:
+                solution = to_solution(parameters.columns, output["solution"])
+            else:
+                # No solution found within the time limit.
+                solution = first_fit_decreasing(instance)
+            if (
+                    warm_start is not None
+                    and instance.check_solution(warm_start)["makespan"]
+                    < instance.check_solution(solution)["makespan"]):
+                solution = warm_start
+            if args.local_search_time_limit > 0:
+                print()
+                output_ls = local_search(
+                        instance,
+                        solution,
+                        time_limit=args.local_search_time_limit,
+                        lower_bound=output.get(
+                            "lower_bound",
+                            batchschedulinglowerbounds.lower_bound(instance)),
+                        new_solution_callback=new_solution_callback)
+                solution = output_ls["solution"]
+        if reduction is not None:
+            solution = reduction.to_original(solution)
+        if args.certificate is not None:
+            write_certificate(args.certificate, {"jobs": solution})
+            print()
+            original_instance.check(args.certificate)
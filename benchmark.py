@@ -0,0 +1,379 @@
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+import batchschedulingwithconflictsmakespan
+import batchschedulinglowerbounds
+
+
+REPOSITORY_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+ALGORITHMS = [
+        "first_fit_decreasing",
+        "dsatur",
+        "local_search",
+        "greedy",
+        "column_generation",
+        "limited_discrepancy_search",
+        ]
+
+FIELDS = [
+        "algorithm",
+        "pricing_algorithm",
+        "instance",
+        "number_of_jobs",
+        "time_limit",
+        "smoothing_factor",
+        "set_covering",
+        "wall_time",
+        "time_pricing",
+        "number_of_iterations",
+        "number_of_pricing_calls",
+        "number_of_mispricings",
+        "time_pricing_build",
+        "time_pricing_solve",
+        "maximum_subproblem_size",
+        "lp_value",
+        "lagrangian_bound",
+        "makespan",
+        "feasible",
+        "certificate_makespan",
+        "gap_to_certificate",
+        "error",
+        ]
+
+
+def instance_path(instance_id):
+    return os.path.join(
+            REPOSITORY_DIRECTORY, "data", "batchschedulingwithconflictsmakepsan",
+            "instance_" + str(instance_id) + ".json")
+
+
+def certificate_path(instance_id):
+    return os.path.join(
+            REPOSITORY_DIRECTORY, "certificates",
+            "batchschedulingwithconflictsmakespan",
+            "certificate_" + str(instance_id) + ".json")
+
+
+def generate_instances(numbers_of_jobs, conflict_density, directory):
+    # Generate a random instance for each number of jobs in directory, and
+    # return the list of their names and paths.
+    instance_files = []
+    for number_of_jobs in numbers_of_jobs:
+        name = "generated_" + str(number_of_jobs)
+        filepath = os.path.join(directory, name)
+        batchschedulingwithconflictsmakespan.generate_instance(
+                filepath, number_of_jobs, conflict_density)
+        instance_files.append(
+                (name,
+                 filepath + batchschedulingwithconflictsmakespan.BINARY_EXTENSION))
+    return instance_files
+
+
+def run(
+        algorithm,
+        instance_id,
+        time_limit,
+        pricing_algorithm,
+        smoothing_factor=0,
+        set_covering=False,
+        filepath=None):
+    # instance_id is the id of an instance of the data directory, or the name
+    # of the instance of filepath.
+    m = batchschedulingwithconflictsmakespan
+    if filepath is None:
+        filepath = instance_path(instance_id)
+    instance = m.Instance(filepath)
+    record = {
+            "algorithm": algorithm,
+            "pricing_algorithm": pricing_algorithm,
+            "instance": instance_id,
+            "number_of_jobs": len(instance.jobs),
+            "time_limit": time_limit,
+            "smoothing_factor": smoothing_factor,
+            "set_covering": set_covering}
+    start = time.time()
+    solution = None
+    if algorithm in m.HEURISTICS:
+        solution = m.HEURISTICS[algorithm](instance)
+    elif algorithm == "local_search":
+        output = m.local_search(
+                instance,
+                m.first_fit_decreasing(instance),
+                time_limit=time_limit,
+                lower_bound=batchschedulinglowerbounds.lower_bound(instance),
+                verbose=False)
+        solution = output["solution"]
+    else:
+        parameters = m.get_parameters(
+                instance, pricing_algorithm,
+                smoothing_factor=smoothing_factor,
+                set_covering=set_covering)
+        if algorithm == "column_generation":
+            output = m.column_generation(
+                    parameters, time_limit=time_limit, verbose=False)
+            record["lp_value"] = output["solution_value"]
+            record["lagrangian_bound"] = output["lagrangian_bound"]
+            record["number_of_iterations"] = output["number_of_iterations"]
+        elif algorithm in ("greedy", "limited_discrepancy_search"):
+            solve = (m.greedy if algorithm == "greedy"
+                     else m.limited_discrepancy_search)
+            output = solve(
+                    parameters,
+                    time_limit=time_limit,
+                    lower_bound=batchschedulinglowerbounds.lower_bound(instance),
+                    verbose=False)
+            # No solution may be found within the time limit.
+            if output["solution"] is not None:
+                solution = m.to_solution(parameters.columns, output["solution"])
+            else:
+                record["feasible"] = False
+        else:
+            raise ValueError(f"Unknown algorithm: {algorithm}.")
+        record["time_pricing"] = output["time_pricing"]
+        statistics = parameters.pricing_solver.statistics
+        record["number_of_pricing_calls"] = statistics.number_of_calls
+        record["number_of_mispricings"] = statistics.number_of_mispricings
+        record["time_pricing_build"] = statistics.time_build
+        record["time_pricing_solve"] = statistics.time_solve
+        record["maximum_subproblem_size"] = statistics.maximum_subproblem_size
+    record["wall_time"] = time.time() - start
+
+    if solution is not None:
+        report = instance.check_solution(solution)
+        record["makespan"] = report["makespan"]
+        record["feasible"] = report["feasible"]
+    if os.path.exists(certificate_path(instance_id)):
+        with open(certificate_path(instance_id)) as json_file:
+            data = json.load(json_file)
+        record["certificate_makespan"] = instance.check_solution(
+                data["jobs"])["makespan"]
+        if "makespan" in record:
+            _, record["gap_to_certificate"] = \
+                batchschedulinglowerbounds.compute_gap(
+                        record["makespan"], record["certificate_makespan"])
+    return record
+
+
+def run_benchmark(
+        algorithms=ALGORITHMS,
+        instance_ids=range(1, 101),
+        time_limit=10,
+        pricing_algorithm="beam_search",
+        smoothing_factor=0,
+        set_covering=False,
+        instance_files=(),
+        verbose=True):
+    # instance_files is a list of names and paths of other instances.
+    records = []
+    instances = [(instance_id, None) for instance_id in instance_ids]
+    instances += list(instance_files)
+    for instance_id, filepath in instances:
+        for algorithm in algorithms:
+            try:
+                record = run(
+                        algorithm, instance_id, time_limit, pricing_algorithm,
+                        smoothing_factor, set_covering, filepath)
+            except Exception as e:
+                record = {
+                        "algorithm": algorithm,
+                        "pricing_algorithm": pricing_algorithm,
+                        "instance": instance_id,
+                        "time_limit": time_limit,
+                        "smoothing_factor": smoothing_factor,
+                        "set_covering": set_covering,
+                        "error": repr(e)}
+            records.append(record)
+            if verbose:
+                print(
+                        '{:>28}'.format(algorithm)
+                        + '{:>18}'.format(str(instance_id))
+                        + '{:>10.3f}'.format(record.get("wall_time", float('nan')))
+                        + '{:>10}'.format(str(record.get("makespan", "")))
+                        + '{:>10}'.format(str(record.get("certificate_makespan", ""))))
+    return records
+
+
+def write_records(records, filepath):
+    # Write the records to filepath + ".json" and filepath + ".csv".
+    with open(filepath + ".json", 'w') as json_file:
+        json.dump(records, json_file, indent=1)
+    with open(filepath + ".csv", 'w', newline='') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=FIELDS)
+        writer.writeheader()
+        for record in records:
+            writer.writerow(record)
+
+
+def compare(
+        baseline_records,
+        records,
+        time_tolerance=0.2,
+        minimum_time_difference=0.05,
+        quality_tolerance=0):
+    # Return the list of regressions of records with respect to
+    # baseline_records. A run is slower if it takes more than
+    # (1 + time_tolerance) times the baseline time, and at least
+    # minimum_time_difference seconds more. A run is worse if its makespan (or
+    # LP value) exceeds the baseline one by more than quality_tolerance
+    # percent. Runs which are only in one of the two lists are reported as
+    # missing.
+    def key(record):
+        return (record["algorithm"],
+                record.get("pricing_algorithm"),
+                record["instance"])
+
+    baseline = {key(record): record for record in baseline_records}
+    regressions = []
+    keys = set(key(record) for record in records)
+    for base_key in baseline:
+        if base_key not in keys:
+            regressions.append({"key": base_key, "type": "missing",
+                                "missing_from": "results"})
+    for record in records:
+        base = baseline.get(key(record))
+        if base is None:
+            regressions.append({"key": key(record), "type": "missing",
+                                "missing_from": "baseline"})
+            continue
+        if "error" in record and "error" not in base:
+            regressions.append({"key": key(record), "type": "error",
+                                "value": record["error"]})
+            continue
+        if "wall_time" in record and "wall_time" in base:
+            if (
+                    record["wall_time"]
+                    > (1 + time_tolerance) * base["wall_time"]
+                    and record["wall_time"] - base["wall_time"]
+                    > minimum_time_difference):
+                regressions.append({"key": key(record), "type": "time",
+                                    "baseline": base["wall_time"],
+                                    "value": record["wall_time"]})
+        if base.get("feasible") and not record.get("feasible", True):
+            regressions.append({"key": key(record), "type": "feasibility"})
+        for field in ("makespan", "lp_value"):
+            if record.get(field) is None or base.get(field) is None:
+                continue
+            if (
+                    record[field]
+                    > base[field] * (1 + quality_tolerance / 100) + 1e-6):
+                regressions.append({"key": key(record), "type": field,
+                                    "baseline": base[field],
+                                    "value": record[field]})
+    return regressions
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='')
+    parser.add_argument(
+            "-a", "--algorithms",
+            type=str,
+            nargs='*',
+            default=ALGORITHMS,
+            help='')
+    parser.add_argument(
+            "-s", "--start",
+            type=int,
+            default=1,
+            help='first instance')
+    parser.add_argument(
+            "-e", "--end",
+            type=int,
+            default=100,
+            help='last instance')
+    parser.add_argument(
+            "-t", "--time-limit",
+            type=float,
+            default=10,
+            help='time limit per run')
+    parser.add_argument(
+            "-p", "--pricing-algorithm",
+            type=str,
+            default="beam_search",
+            help='')
+    parser.add_argument(
+            "--smoothing-factor",
+            type=float,
+            default=0,
+            help='Wentges smoothing factor of the dual stabilization')
+    parser.add_argument(
+            "--set-covering",
+            action='store_true',
+            help='use a set covering master problem')
+    parser.add_argument(
+            "-g", "--generated-numbers-of-jobs",
+            type=int,
+            nargs='*',
+            default=[],
+            help='also run the benchmark on random instances with these '
+            'numbers of jobs')
+    parser.add_argument(
+            "--conflict-density",
+            type=float,
+            default=0.0005,
+            help='conflict density of the random instances')
+    parser.add_argument(
+            "-o", "--output",
+            type=str,
+            default="benchmark",
+            help='output file prefix, .json and .csv files are written')
+    parser.add_argument(
+            "-r", "--results",
+            type=str,
+            default=None,
+            help='JSON results to compare instead of running the benchmark')
+    parser.add_argument(
+            "-b", "--baseline",
+            type=str,
+            default=None,
+            help='JSON results of a previous run to compare to')
+    parser.add_argument(
+            "--time-tolerance",
+            type=float,
+            default=0.2,
+            help='')
+    parser.add_argument(
+            "--quality-tolerance",
+            type=float,
+            default=0,
+            help='in percent')
+
+    args = parser.parse_args()
+
+    if args.results is not None:
+        with open(args.results) as json_file:
+            records = json.load(json_file)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            instance_files = generate_instances(
+                    args.generated_numbers_of_jobs,
+                    args.conflict_density,
+                    directory)
+            records = run_benchmark(
+                    args.algorithms,
+                    range(args.start, args.end + 1),
+                    args.time_limit,
+                    args.pricing_algorithm,
+                    args.smoothing_factor,
+                    args.set_covering,
+                    instance_files)
+        write_records(records, args.output)
+
+    if args.baseline is not None:
+        with open(args.baseline) as json_file:
+            baseline_records = json.load(json_file)
+        regressions = compare(
+                baseline_records,
+                records,
+                time_tolerance=args.time_tolerance,
+                quality_tolerance=args.quality_tolerance)
+        print()
+        print(f"Number of regressions: {len(regressions)}")
+        for regression in regressions:
+            print(regression)
+        if regressions:
+            sys.exit(1)
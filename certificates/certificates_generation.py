@@ -1,106 +1,257 @@
+import concurrent.futures
+import contextlib
+import io
 import json
-import sys 
+import re
+import sys
 import os
-sys.path.append(os.path.abspath(r"C:\Users\phopp\OneDrive\Desktop\ORCO\Advanced-OR-methods\git-project\AMOP-Batch-scheduling\some-solutions"))
+import time
+
+REPOSITORY_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(REPOSITORY_DIRECTORY)
+
 import knapsackwithwidthandconflicts
 import knapsackwithwidth
 import batchschedulingmakespan
 import batchschedulingwithconflictsmakespan
 import treesearchsolverpy
 import columngenerationsolverpy
+import batchschedulinglowerbounds
+
+
+# Problem name: (module, name of the data directory).
+PROBLEMS = {
+        "knapsackwithwidth": (
+            knapsackwithwidth,
+            "knapsackwithwidthandconflicts"),
+        "knapsackwithwidthandconflicts": (
+            knapsackwithwidthandconflicts,
+            "knapsackwithwidthandconflicts"),
+        "batchschedulingmakespan": (
+            batchschedulingmakespan,
+            "batchschedulingwithconflictsmakepsan"),
+        "batchschedulingwithconflictsmakespan": (
+            batchschedulingwithconflictsmakespan,
+            "batchschedulingwithconflictsmakepsan"),
+        }
+
+
+def instance_path(problem, instance_id):
+    _, data_name = PROBLEMS[problem]
+    return os.path.join(
+            REPOSITORY_DIRECTORY, "data", data_name,
+            "instance_" + str(instance_id) + ".json")
+
+
+def certificate_path(problem, instance_id):
+    return os.path.join(
+            REPOSITORY_DIRECTORY, "certificates", problem,
+            "certificate_" + str(instance_id) + ".json")
+
+
+def solve_knapsackwithwidth(filepath, time_limit):
+    instance = knapsackwithwidth.Instance(filepath)
+    solution = knapsackwithwidth.dynamic_programming(instance)
+    return {"items": solution}
+
+
+def solve_knapsackwithwidthandconflicts(filepath, time_limit):
+    instance = knapsackwithwidthandconflicts.Instance(filepath)
+    branching_scheme = knapsackwithwidthandconflicts.BranchingScheme(instance)
+    output = treesearchsolverpy.iterative_beam_search(
+            branching_scheme, time_limit=time_limit, verbose=False)
+    solution = branching_scheme.to_solution(output["solution_pool"].best)
+    return {"items": solution}
+
 
+def solve_batchschedulingmakespan(filepath, time_limit):
+    instance = batchschedulingmakespan.Instance(filepath)
+    parameters = batchschedulingmakespan.get_parameters(instance)
+    output = columngenerationsolverpy.limited_discrepancy_search(
+            parameters, verbose=False, time_limit=time_limit)
+    solution = batchschedulingmakespan.to_solution(
+            parameters.columns, output["solution"])
+    return {"jobs": solution}
 
 
-def generate_certificates_knapsackwithwidth(start=0, end=100):
-    for i in range(start, end + 1):
-        print("Generating certificate for instance " + str(i) + "...")
-        instance = knapsackwithwidth.Instance("AMOP-Batch-scheduling/data/knapsackwithwidthandconflicts/instance_" + str(i) + ".json")
-        solution = knapsackwithwidth.dynamic_programming(instance)
-        data = {"items": solution}
-        certificate_name = "AMOP-Batch-scheduling/certificates/knapsackwithwidthandconflicts/certificate_" + str(i) + ".json"
-        with open(certificate_name, 'w') as json_file:
-            json.dump(data, json_file)
-
-def check_certificates_knapsackwithwidth(start=0, end=100):
-    fails = []
-    for i in range(start, end + 1):
-        instance = knapsackwithwidth.Instance("AMOP-Batch-scheduling/data/knapsackwithwidthandconflicts/instance_" + str(i) + ".json")
-        certificate_name = "AMOP-Batch-scheduling/certificates/knapsackwithwidth/certificate_" + str(i) + ".json"
-        (val, _) = instance.check(certificate_name)
-        if not val:
-            fails.append(i)
-    print(fails)
-
-
-
-def generate_certificates_knapsackwithwidthandconflicts(start=0, end=100, limit=30):
-    for i in range(start, end + 1):
-        print("Generating certificate for instance " + str(i) + "...")
-        instance = knapsackwithwidthandconflicts.Instance("AMOP-Batch-scheduling/data/knapsackwithwidthandconflicts/instance_" + str(i) + ".json")
-        branching_scheme = knapsackwithwidthandconflicts.BranchingScheme(instance)
-        output = treesearchsolverpy.iterative_beam_search(branching_scheme, time_limit=limit, verbose=False)
-        solution = branching_scheme.to_solution(output["solution_pool"].best)
-        data = {"items": solution}
-        certificate_name = "AMOP-Batch-scheduling/certificates/knapsackwithwidthandconflicts/certificate_" + str(i) + ".json"
-        with open(certificate_name, 'w') as json_file:
-            json.dump(data, json_file)
-
-def check_certificates_knapsackwithwidthandconflicts(start=0, end=100):
-    fails = []
-    for i in range(start, end + 1):
-        instance = knapsackwithwidthandconflicts.Instance("AMOP-Batch-scheduling/data/knapsackwithwidthandconflicts/instance_" + str(i) + ".json")
-        certificate_name = "AMOP-Batch-scheduling/certificates/knapsackwithwidthandconflicts/certificate_" + str(i) + ".json"
-        (val, _) = instance.check(certificate_name)
-        if not val:
-            fails.append(i)
-    print(fails)
-
-def generate_certificates_batchschedulingmakespan(start=0, end=100, limit=60):
-    for i in range(start, end + 1):
-        print("Generating certificate for instance " + str(i) + "...")
-        instance = batchschedulingmakespan.Instance("AMOP-Batch-scheduling/data/batchschedulingwithconflictsmakepsan/instance_" + str(i) + ".json")
-        parameters = batchschedulingmakespan.get_parameters(instance)
-        output = columngenerationsolverpy.limited_discrepancy_search(parameters, verbose=False, time_limit=limit)
-        solution = batchschedulingmakespan.to_solution(parameters.columns, output["solution"])
-        data = {"jobs": solution}
-        certificate_name = "AMOP-Batch-scheduling/certificates/batchschedulingmakespan/certificate_" + str(i) + ".json"
-        with open(certificate_name, 'w') as json_file:
-            json.dump(data, json_file)
-
-def check_certificates_batchschedulingmakespan(start=0, end=100):
-    fails = []
-    for i in range(start, end + 1):
-        instance = batchschedulingmakespan.Instance("AMOP-Batch-scheduling/data/batchschedulingwithconflictsmakepsan/instance_" + str(i) + ".json")
-        certificate_name = "AMOP-Batch-scheduling/certificates/batchschedulingmakespan/certificate_" + str(i) + ".json"
-        (val, _) = instance.check(certificate_name)
-        if not val:
-            fails.append(i)
-    print(fails)
-
-
-def generate_certificates_batchschedulingwithconflictsmakespan(start=0, end=100, limit=60):
-    for i in range(start, end + 1):
-        print("Generating certificate for instance " + str(i) + "...")
-        instance = batchschedulingwithconflictsmakespan.Instance("AMOP-Batch-scheduling/data/batchschedulingwithconflictsmakepsan/instance_" + str(i) + ".json")
-        parameters = batchschedulingwithconflictsmakespan.get_parameters(instance)
-        output = columngenerationsolverpy.limited_discrepancy_search(parameters, time_limit=limit, verbose=False)
-        solution = batchschedulingwithconflictsmakespan.to_solution(parameters.columns, output["solution"])
-        data = {"jobs": solution}
-        certificate_name = "AMOP-Batch-scheduling/certificates/batchschedulingwithconflictsmakespan/certificate_" + str(i) + ".json"
-        with open(certificate_name, 'w') as json_file:
-            json.dump(data, json_file)
-
-def check_certificates_batchschedulingwithconflictsmakespan(start=0, end=100):
-    fails = []
-    for i in range(start, end + 1):
-        instance = batchschedulingwithconflictsmakespan.Instance("AMOP-Batch-scheduling/data/batchschedulingwithconflictsmakepsan/instance_" + str(i) + ".json")
-        certificate_name = "AMOP-Batch-scheduling/certificates/batchschedulingwithconflictsmakespan/certificate_" + str(i) + ".json"
-        (val, _) = instance.check(certificate_name)
-        if not val:
-            fails.append(i)
-    print(fails)
+def solve_batchschedulingwithconflictsmakespan(filepath, time_limit):
+    instance = batchschedulingwithconflictsmakespan.Instance(filepath)
+    parameters = batchschedulingwithconflictsmakespan.get_parameters(instance)
+    output = columngenerationsolverpy.limited_discrepancy_search(
+            parameters, verbose=False, time_limit=time_limit)
+    solution = batchschedulingwithconflictsmakespan.to_solution(
+            parameters.columns, output["solution"])
+    return {"jobs": solution}
+
+
+SOLVERS = {
+        "knapsackwithwidth": solve_knapsackwithwidth,
+        "knapsackwithwidthandconflicts": solve_knapsackwithwidthandconflicts,
+        "batchschedulingmakespan": solve_batchschedulingmakespan,
+        "batchschedulingwithconflictsmakespan": solve_batchschedulingwithconflictsmakespan,
+        }
+
+
+def check_certificate(problem, instance_id):
+    module, _ = PROBLEMS[problem]
+    report = {
+            "problem": problem,
+            "instance": instance_id,
+            "instance_path": instance_path(problem, instance_id),
+            "certificate_path": certificate_path(problem, instance_id)}
+    try:
+        instance = module.Instance(report["instance_path"])
+        if hasattr(instance, "check_solution"):
+            with open(report["certificate_path"]) as json_file:
+                data = json.load(json_file)
+            report.update(instance.check_solution(data["jobs"]))
+            # The instances of batchschedulingmakespan have no conflicts.
+            if module is batchschedulingmakespan:
+                report["lower_bound"] = \
+                    batchschedulinglowerbounds.bin_packing_bound(instance)
+            else:
+                report["lower_bound"] = \
+                    batchschedulinglowerbounds.lower_bound(instance)
+            (report["absolute_gap"], report["relative_gap"]) = \
+                batchschedulinglowerbounds.compute_gap(
+                        report["makespan"], report["lower_bound"])
+        else:
+            with contextlib.redirect_stdout(io.StringIO()):
+                (feasible, value) = instance.check(report["certificate_path"])
+            report["feasible"] = feasible
+            report["value"] = value
+    except Exception as e:
+        report["feasible"] = False
+        report["error"] = repr(e)
+    return report
+
+
+def check_certificates(problem, start=0, end=float('inf')):
+    # Check all the certificates of certificates/<problem>/ against the
+    # corresponding instances of data/ and return one report per instance.
+    certificates_directory = os.path.join(REPOSITORY_DIRECTORY, "certificates", problem)
+    instance_ids = []
+    for filename in os.listdir(certificates_directory):
+        match = re.fullmatch(r"certificate_(\d+)\.json", filename)
+        if match is None:
+            continue
+        instance_id = int(match.group(1))
+        if start <= instance_id <= end:
+            instance_ids.append(instance_id)
+    return [check_certificate(problem, instance_id)
+            for instance_id in sorted(instance_ids)]
+
+
+def generate_certificate(problem, instance_id, time_limit):
+    start = time.time()
+    data = SOLVERS[problem](instance_path(problem, instance_id), time_limit)
+    batchschedulingwithconflictsmakespan.write_certificate(
+            certificate_path(problem, instance_id), data)
+    report = check_certificate(problem, instance_id)
+    report["time"] = time.time() - start
+    return report
+
+
+def generate_certificates(
+        problems=tuple(PROBLEMS),
+        start=1,
+        end=100,
+        time_limit=60,
+        number_of_processes=None,
+        force=False):
+    # Build the list of tasks. Certificates which already exist and pass the
+    # checker are skipped, unless force is set. The instances 0 are empty and
+    # have no certificate, so they are skipped by default.
+    tasks = []
+    for problem in problems:
+        for instance_id in range(start, end + 1):
+            if not os.path.exists(instance_path(problem, instance_id)):
+                continue
+            if (
+                    not force
+                    and os.path.exists(certificate_path(problem, instance_id))
+                    and check_certificate(problem, instance_id)["feasible"]):
+                continue
+            tasks.append((problem, instance_id))
+    # Largest instances first, so that they don't end up alone at the end of
+    # the run.
+    tasks.sort(
+            key=lambda task: os.path.getsize(instance_path(*task)),
+            reverse=True)
+    print(f"Number of certificates to generate: {len(tasks)}")
+
+    reports = []
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=number_of_processes) as executor:
+        futures = {
+                executor.submit(
+                    generate_certificate, problem, instance_id, time_limit):
+                (problem, instance_id)
+                for problem, instance_id in tasks}
+        for future in concurrent.futures.as_completed(futures):
+            problem, instance_id = futures[future]
+            try:
+                report = future.result()
+            except Exception as e:
+                report = {
+                        "problem": problem,
+                        "instance": instance_id,
+                        "feasible": False,
+                        "error": repr(e)}
+            reports.append(report)
+            print(f"{problem} {instance_id}: feasible {report['feasible']}")
+    return reports
 
 
 if __name__ == '__main__':
-    generate_certificates_batchschedulingwithconflictsmakespan(start=100, limit=300)
-    check_certificates_batchschedulingwithconflictsmakespan(start=100)
+    import argparse
+    parser = argparse.ArgumentParser(description='')
+    parser.add_argument(
+            "-p", "--problem",
+            type=str,
+            nargs='*',
+            default=list(PROBLEMS),
+            help='')
+    parser.add_argument(
+            "-s", "--start",
+            type=int,
+            default=1,
+            help='')
+    parser.add_argument(
+            "-e", "--end",
+            type=int,
+            default=100,
+            help='')
+    parser.add_argument(
+            "-t", "--time-limit",
+            type=float,
+            default=60,
+            help='time limit per instance')
+    parser.add_argument(
+            "-j", "--processes",
+            type=int,
+            default=None,
+            help='number of worker processes')
+    parser.add_argument(
+            "-f", "--force",
+            action='store_true',
+            help='regenerate certificates which are already valid')
+    parser.add_argument(
+            "--check-only",
+            action='store_true',
+            help='')
+
+    args = parser.parse_args()
+
+    if not args.check_only:
+        generate_certificates(
+                args.problem,
+                args.start,
+                args.end,
+                args.time_limit,
+                args.processes,
+                args.force)
+    for problem in args.problem:
+        reports = check_certificates(problem, args.start, args.end)
+        fails = [report["instance"] for report in reports if not report["feasible"]]
+        print(f"{problem}: {len(reports)} certificates, fails: {fails}")
@@ -0,0 +1,122 @@
+import json
+import os
+import socket
+import threading
+import solverserver
+
+
+def connect(address):
+    address = solverserver.parse_address(address)
+    if isinstance(address, tuple):
+        return socket.create_connection(address)
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.connect(address)
+    return connection
+
+
+def solve(address, requests):
+    # Send the requests to the server and yield the responses, in completion
+    # order. Requests are sent from a separate thread so that the server can
+    # start solving before all of them are sent.
+    connection = connect(address)
+    requests = list(requests)
+
+    def send():
+        with connection.makefile('wb') as request_file:
+            for request in requests:
+                request_file.write(json.dumps(request).encode() + b"\n")
+        connection.shutdown(socket.SHUT_WR)
+
+    sender = threading.Thread(target=send)
+    sender.start()
+    with connection, connection.makefile('rb') as response_file:
+        for line in response_file:
+            yield json.loads(line)
+    sender.join()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='')
+    parser.add_argument(
+            "-s", "--server",
+            type=str,
+            default="batchscheduling.sock",
+            help='Unix socket path, or host:port for a TCP socket')
+    parser.add_argument(
+            "-i", "--instances",
+            type=str,
+            nargs='+',
+            help='')
+    parser.add_argument(
+            "-a", "--algorithm",
+            type=str,
+            default="limited_discrepancy_search",
+            help='')
+    parser.add_argument(
+            "-p", "--pricing-algorithm",
+            type=str,
+            default="beam_search",
+            help='')
+    parser.add_argument(
+            "-t", "--time-limit",
+            type=float,
+            default=None,
+            help='time limit per instance')
+    parser.add_argument(
+            "-c", "--certificates",
+            type=str,
+            default=None,
+            help='directory where the certificates are written, with the '
+            'file names of the instances')
+    parser.add_argument(
+            "-w", "--warm-start",
+            type=str,
+            default=None,
+            help='directory of the certificates of a previous run, used as '
+            'warm start when they exist')
+    parser.add_argument(
+            "--send-instances",
+            action='store_true',
+            help='send the content of the instance files instead of their '
+            'paths, for servers which can\'t read them')
+
+    args = parser.parse_args()
+
+    requests = []
+    for instance_id, instance_path in enumerate(args.instances):
+        request = {
+                "id": instance_id,
+                "algorithm": args.algorithm,
+                "pricing_algorithm": args.pricing_algorithm,
+                "time_limit": args.time_limit}
+        if args.send_instances:
+            with open(instance_path) as json_file:
+                request["instance"] = json.load(json_file)
+        else:
+            request["instance_path"] = os.path.abspath(instance_path)
+        if args.warm_start is not None:
+            certificate_path = os.path.join(
+                    args.warm_start, os.path.basename(instance_path))
+            if os.path.exists(certificate_path):
+                with open(certificate_path) as json_file:
+                    request["warm_start"] = json.load(json_file)["jobs"]
+        requests.append(request)
+
+    if args.certificates is not None:
+        os.makedirs(args.certificates, exist_ok=True)
+    for response in solve(args.server, requests):
+        instance_path = args.instances[response["id"]]
+        if "error" in response:
+            print(f"{instance_path}: error {response['error']}")
+            continue
+        print(f"{instance_path}: "
+              f"makespan {response['makespan']} "
+              f"lower bound {response['lower_bound']} "
+              f"feasible {response['feasible']} "
+              f"time {round(response['time'], 3)}")
+        if args.certificates is not None:
+            certificate_path = os.path.join(
+                    args.certificates, os.path.basename(instance_path))
+            with open(certificate_path, 'w') as json_file:
+                json.dump({"jobs": response["jobs"]}, json_file)
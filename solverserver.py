@@ -0,0 +1,258 @@
+import collections
+import concurrent.futures
+import hashlib
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+import batchschedulingwithconflictsmakespan
+import batchschedulinglowerbounds
+
+
+# Protocol: the client sends one JSON request per line and the server answers
+# with one JSON response per line, in completion order. A request contains:
+# - "id": returned as is in the response
+# - "instance": content of a JSON instance file, or "instance_path": path of
+#   an instance file readable by the server
+# - "algorithm": see solve, "limited_discrepancy_search" by default
+# - "pricing_algorithm": "beam_search" by default
+# - "time_limit": positive and finite, DEFAULT_TIME_LIMIT by default
+# - "smoothing_factor": Wentges smoothing factor of the dual stabilization, in
+#   [0, 1), 0 by default
+# - "warm_start": batches of a previous solution, repaired if needed, used as
+#   initial columns and as initial solution
+# The response contains "id", "jobs" (the certificate), "makespan",
+# "feasible", "lower_bound", "time" and, for the column generation
+# algorithms, the pricing "statistics", or "error" if the solve failed.
+
+# Instances recently solved by the worker process, with their column pools,
+# so that solving the same instance again starts from the columns generated
+# before.
+MAXIMUM_CACHE_SIZE = 32
+cache = collections.OrderedDict()
+
+# Time limit of the requests without one, in seconds, as for the command line
+# of batchschedulingwithconflictsmakespan.
+DEFAULT_TIME_LIMIT = 10
+
+
+def parse_address(address):
+    # "host:port" for a TCP socket, a path for a Unix socket.
+    host, separator, port = address.rpartition(":")
+    if separator and port.isdigit():
+        return (host or "localhost", int(port))
+    return address
+
+
+def cache_key(request):
+    if "instance_path" in request:
+        status = os.stat(request["instance_path"])
+        return ("path",
+                os.path.abspath(request["instance_path"]),
+                status.st_mtime_ns,
+                status.st_size)
+    data = json.dumps(request["instance"], sort_keys=True).encode()
+    return ("data", hashlib.sha1(data).hexdigest())
+
+
+def get_entry(request):
+    key = cache_key(request)
+    entry = cache.get(key)
+    if entry is not None:
+        cache.move_to_end(key)
+        return entry
+    if "instance_path" in request:
+        instance = batchschedulingwithconflictsmakespan.Instance(
+                request["instance_path"])
+    else:
+        instance = batchschedulingwithconflictsmakespan.Instance()
+        instance.read_data(request["instance"])
+    entry = {
+            "instance": instance,
+            "lower_bound": batchschedulinglowerbounds.lower_bound(instance),
+            "column_pool": {}}
+    cache[key] = entry
+    if len(cache) > MAXIMUM_CACHE_SIZE:
+        cache.popitem(last=False)
+    return entry
+
+
+def solve(request):
+    # Solve a request in a worker process.
+    m = batchschedulingwithconflictsmakespan
+    start = time.time()
+    response = {"id": request.get("id")}
+    try:
+        entry = get_entry(request)
+        instance = entry["instance"]
+        algorithm = request.get("algorithm", "limited_discrepancy_search")
+        time_limit = request.get("time_limit")
+        if time_limit is None:
+            time_limit = DEFAULT_TIME_LIMIT
+        if not 0 < time_limit < float('inf'):
+            raise ValueError(
+                    "The time limit must be positive and finite, got "
+                    f"{time_limit}.")
+        warm_start = None
+        if request.get("warm_start") is not None:
+            warm_start = m.repair_solution(instance, request["warm_start"])
+        if algorithm in m.HEURISTICS:
+            solution = m.HEURISTICS[algorithm](instance)
+        elif algorithm == "local_search":
+            output = m.local_search(
+                    instance,
+                    (warm_start if warm_start is not None
+                     else m.first_fit_decreasing(instance)),
+                    time_limit=time_limit,
+                    lower_bound=entry["lower_bound"],
+                    verbose=False)
+            solution = output["solution"]
+        elif algorithm in ("greedy", "limited_discrepancy_search"):
+            parameters = m.get_parameters(
+                    instance,
+                    request.get("pricing_algorithm", "beam_search"),
+                    warm_start,
+                    smoothing_factor=request.get("smoothing_factor", 0),
+                    column_pool=entry["column_pool"])
+            if algorithm == "greedy":
+                output = m.greedy(
+                        parameters,
+                        time_limit=time_limit,
+                        lower_bound=entry["lower_bound"],
+                        initial_solution=warm_start,
+                        verbose=False)
+            else:
+                output = m.limited_discrepancy_search(
+                        parameters,
+                        time_limit=time_limit,
+                        lower_bound=entry["lower_bound"],
+                        initial_solution=warm_start,
+                        verbose=False)
+            response["statistics"] = \
+                parameters.pricing_solver.statistics.to_dict()
+            if output["solution"] is not None:
+                solution = m.to_solution(parameters.columns, output["solution"])
+            elif warm_start is not None:
+                solution = warm_start
+            else:
+                raise ValueError("No solution found within the time limit.")
+        else:
+            raise ValueError(f"Unknown algorithm: {algorithm}.")
+        if (
+                warm_start is not None
+                and instance.check_solution(warm_start)["makespan"]
+                < instance.check_solution(solution)["makespan"]):
+            solution = warm_start
+        report = instance.check_solution(solution)
+        response["jobs"] = solution
+        response["makespan"] = report["makespan"]
+        response["feasible"] = report["feasible"]
+        response["lower_bound"] = entry["lower_bound"]
+    except Exception as e:
+        response["error"] = repr(e)
+    response["time"] = time.time() - start
+    return response
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        lock = threading.Lock()
+        # Number of requests whose response hasn't been written yet.
+        condition = threading.Condition()
+        number_of_pending_requests = [0]
+
+        def write_response(response):
+            with lock:
+                self.wfile.write(json.dumps(response).encode() + b"\n")
+                self.wfile.flush()
+
+        def done_callback(future):
+            try:
+                response = future.result()
+            except Exception as e:
+                # The worker process died.
+                response = {"id": future.request_id, "error": repr(e)}
+            try:
+                write_response(response)
+            except OSError:
+                # The client is gone.
+                pass
+            with condition:
+                number_of_pending_requests[0] -= 1
+                condition.notify()
+
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                write_response({"id": None, "error": repr(e)})
+                continue
+            with condition:
+                number_of_pending_requests[0] += 1
+            future = self.server.executor.submit(solve, request)
+            future.request_id = request.get("id")
+            future.add_done_callback(done_callback)
+        # Keep the connection open until all the responses are sent.
+        with condition:
+            condition.wait_for(lambda: number_of_pending_requests[0] == 0)
+
+
+class TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(address, number_of_workers=None):
+    address = parse_address(address)
+    if isinstance(address, tuple):
+        server = TCPServer(address, RequestHandler)
+    else:
+        if os.path.exists(address):
+            # Remove the socket of a previous server, unless it is running.
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(address)
+                probe.close()
+                raise OSError(f"A server is already listening on {address}.")
+            except ConnectionRefusedError:
+                os.remove(address)
+        server = UnixServer(address, RequestHandler)
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=number_of_workers) as executor:
+        server.executor = executor
+        print(f"Listening on {address}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            if not isinstance(address, tuple):
+                os.remove(address)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='')
+    parser.add_argument(
+            "-a", "--address",
+            type=str,
+            default="batchscheduling.sock",
+            help='Unix socket path, or host:port for a TCP socket')
+    parser.add_argument(
+            "-j", "--workers",
+            type=int,
+            default=None,
+            help='number of worker processes')
+
+    args = parser.parse_args()
+    serve(args.address, args.workers)
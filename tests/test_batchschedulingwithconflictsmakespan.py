@@ -0,0 +1,337 @@
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+import pytest
+
+REPOSITORY_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(REPOSITORY_DIRECTORY)
+
+import batchschedulingwithconflictsmakespan as m
+
+
+def instance_path(instance_id):
+    return os.path.join(
+            REPOSITORY_DIRECTORY, "data", "batchschedulingwithconflictsmakepsan",
+            f"instance_{instance_id}.json")
+
+
+def random_knapsack(rng, maximum_number_of_items):
+    # Random knapsack problem with width and conflicts, as solved by the
+    # pricing algorithms.
+    number_of_items = rng.randint(0, maximum_number_of_items)
+    capacity = rng.randint(1, 30)
+    sizes = [rng.randint(1, 15) for _ in range(number_of_items)]
+    processing_times = [rng.randint(1, 10) for _ in range(number_of_items)]
+    profits = [rng.random() * 12 for _ in range(number_of_items)]
+    conflicts = [
+            (i, j)
+            for i in range(number_of_items)
+            for j in range(i + 1, number_of_items)
+            if rng.random() < 0.3]
+    return (
+            capacity, sizes, processing_times, profits,
+            m.conflict_bitmasks(number_of_items, conflicts))
+
+
+def knapsack_value(processing_times, profits, solution):
+    return (
+            sum(profits[i] for i in solution)
+            - max(processing_times[i] for i in solution))
+
+
+def test_knapsack_branch_and_bound():
+    # Compare the solutions of the branch-and-bound with the best solutions
+    # found by enumeration.
+    rng = random.Random(0)
+    for _ in range(300):
+        capacity, sizes, processing_times, profits, conflicts = \
+            random_knapsack(rng, 10)
+        number_of_items = len(sizes)
+        values = []
+        for number_of_selected_items in range(1, number_of_items + 1):
+            for solution in itertools.combinations(
+                    range(number_of_items), number_of_selected_items):
+                if sum(sizes[i] for i in solution) > capacity:
+                    continue
+                if any((conflicts[i] >> j) & 1
+                       for i in solution for j in solution):
+                    continue
+                value = knapsack_value(processing_times, profits, solution)
+                if value > 0:
+                    values.append(value)
+        values.sort(reverse=True)
+        maximum_number_of_solutions = rng.choice([1, 3, 8])
+        solutions = m.knapsack_branch_and_bound(
+                capacity, sizes, processing_times, profits, conflicts,
+                maximum_number_of_solutions=maximum_number_of_solutions)
+        assert len(set(map(frozenset, solutions))) == len(solutions)
+        assert len(solutions) == min(len(values), maximum_number_of_solutions)
+        for solution, value in zip(solutions, values):
+            assert sum(sizes[i] for i in solution) <= capacity
+            assert not any((conflicts[i] >> j) & 1
+                           for i in solution for j in solution)
+            assert abs(
+                    knapsack_value(processing_times, profits, solution)
+                    - value) < 1e-9
+
+
+def test_knapsack_upper_bounds():
+    # The bounds are at least the value and the ratio of the solutions of the
+    # branch-and-bound.
+    rng = random.Random(0)
+    for _ in range(200):
+        capacity, sizes, processing_times, profits, conflicts = \
+            random_knapsack(rng, 14)
+        best_bound, best_ratio = m.knapsack_upper_bounds(
+                capacity, sizes, processing_times, profits, conflicts)
+        solutions = m.knapsack_branch_and_bound(
+                capacity, sizes, processing_times, profits, conflicts,
+                maximum_number_of_solutions=16)
+        for solution in solutions:
+            assert knapsack_value(
+                    processing_times, profits, solution) <= best_bound + 1e-9
+            assert (
+                    sum(profits[i] for i in solution)
+                    <= best_ratio * max(processing_times[i] for i in solution)
+                    + 1e-9)
+
+
+def test_lagrangian_bound():
+    # With an exact pricing, the Lagrangian bounds of the column generation
+    # are at most the value of the linear relaxation it converges to, up to
+    # the tolerance of the linear programming solver.
+    for instance_id in [5, 20, 45]:
+        instance = m.Instance(instance_path(instance_id))
+        parameters = m.get_parameters(instance, "branch_and_bound")
+        output = m.column_generation(parameters, verbose=False)
+        assert output["lagrangian_bound"] != float('-inf')
+        assert output["lagrangian_bound"] <= output["solution_value"] + 1e-4
+        for point in output["bound_trajectory"]:
+            assert point["lagrangian_bound"] <= output["solution_value"] + 1e-4
+        # The times of the trajectory start with each column generation.
+        start = time.time()
+        output = m.column_generation(parameters, verbose=False)
+        parameters.pricing_solver.close()
+        for point in output["bound_trajectory"]:
+            assert 0 <= point["time"] <= time.time() - start
+
+
+def test_branch_and_bound_pricing_deadline(tmp_path):
+    # On a 500-job instance, the branch-and-bound pricing can't be solved to
+    # optimality within the time limit, and the column generation still
+    # stops close to it.
+    filepath = str(tmp_path / "instance")
+    m.generate_instance(filepath, 500, 0.05, seed=5)
+    instance = m.Instance(filepath + ".json")
+    parameters = m.get_parameters(instance, "branch_and_bound")
+    start = time.time()
+    output = m.column_generation(parameters, time_limit=2, verbose=False)
+    parameters.pricing_solver.close()
+    assert time.time() - start < 4
+    assert output["interrupted"]
+    assert output["number_of_columns_added"] > 0
+    assert output["lagrangian_bound"] <= output["solution_value"] + 1e-4
+
+
+def test_get_parameters_column_pool():
+    # The initial columns are taken from the given column pool, so that a
+    # batch never has two columns.
+    instance = m.Instance(instance_path(20))
+    batches = m.first_fit_decreasing(instance)
+    parameters = m.get_parameters(instance, initial_batches=batches)
+    column_pool = parameters.pricing_solver.column_pool
+    m.column_generation(parameters, verbose=False)
+    parameters = m.get_parameters(
+            instance, initial_batches=batches, column_pool=column_pool)
+    assert parameters.pricing_solver.column_pool is column_pool
+    pool_column_ids = set(id(column) for column in column_pool.values())
+    assert len(parameters.columns) == len(batches)
+    for column in parameters.columns:
+        assert id(column) in pool_column_ids
+
+
+def test_cascade_builds_subproblem_once(monkeypatch):
+    # The conflict bitmasks are built once for all the pricing calls and
+    # stages of the cascade while the fixed columns don't change.
+    number_of_builds = []
+    conflict_bitmasks = m.conflict_bitmasks
+
+    def counting_conflict_bitmasks(number_of_items, conflicts):
+        number_of_builds.append(number_of_items)
+        return conflict_bitmasks(number_of_items, conflicts)
+
+    monkeypatch.setattr(m, "conflict_bitmasks", counting_conflict_bitmasks)
+    instance = m.Instance(instance_path(20))
+    parameters = m.get_parameters(instance, "cascade")
+    output = m.column_generation(parameters, verbose=False)
+    parameters.pricing_solver.close()
+    assert output["number_of_columns_added"] > 0
+    assert number_of_builds == [len(instance.jobs)]
+
+
+def test_branch_and_bound_parallel():
+    # The parts of the parallel branch-and-bound give the columns of the
+    # sequential one, so that the column generations are the same.
+    instance = m.Instance(instance_path(45))
+    outputs = []
+    for number_of_processes in [1, 2]:
+        parameters = m.get_parameters(
+                instance, "branch_and_bound",
+                number_of_processes=number_of_processes)
+        parameters.pricing_solver.minimum_parallel_subproblem_size = 0
+        outputs.append(m.column_generation(parameters, verbose=False))
+        parameters.pricing_solver.close()
+    assert (
+            outputs[0]["number_of_iterations"]
+            == outputs[1]["number_of_iterations"])
+    assert outputs[0]["solution_value"] == outputs[1]["solution_value"]
+
+
+def test_write_certificate_mode(tmp_path):
+    # A new certificate has the default mode of new files, and a rewritten
+    # certificate keeps its mode.
+    filepath = str(tmp_path / "certificate.json")
+    umask = os.umask(0o022)
+    try:
+        m.write_certificate(filepath, {"jobs": []})
+    finally:
+        os.umask(umask)
+    assert os.stat(filepath).st_mode & 0o777 == 0o644
+    os.chmod(filepath, 0o640)
+    m.write_certificate(filepath, {"jobs": [[0]]})
+    assert os.stat(filepath).st_mode & 0o777 == 0o640
+    assert os.listdir(tmp_path) == ["certificate.json"]
+
+
+def optimal_solution(instance):
+    # Best solution found by enumerating the partitions of the jobs into
+    # batches.
+    number_of_jobs = len(instance.jobs)
+    best = [float('inf'), None]
+
+    def enumerate_batches(job_id, batches):
+        if job_id == number_of_jobs:
+            makespan = sum(
+                    max(instance.processing_times[j] for j in batch)
+                    for batch in batches)
+            if makespan < best[0]:
+                best[0] = makespan
+                best[1] = [list(batch) for batch in batches]
+            return
+        for batch in batches:
+            if (
+                    sum(instance.sizes[j] for j in batch)
+                    + instance.sizes[job_id] > instance.batch_capacity):
+                continue
+            if any(instance.conflicting(job_id, j) for j in batch):
+                continue
+            batch.append(job_id)
+            enumerate_batches(job_id + 1, batches)
+            batch.pop()
+        batches.append([job_id])
+        enumerate_batches(job_id + 1, batches)
+        batches.pop()
+
+    instance.build_conflict_index()
+    enumerate_batches(0, [])
+    return best[0], best[1]
+
+
+def test_reduce():
+    # The optimal solutions of the reduced instances, mapped back to the
+    # original instances, are optimal.
+    rng = random.Random(0)
+    number_of_fixed_batches = 0
+    for _ in range(200):
+        instance = m.Instance()
+        instance.batch_capacity = 10
+        for _ in range(rng.randint(1, 7)):
+            instance.add_job(rng.randint(1, 10), rng.randint(1, 8))
+        for j1 in range(len(instance.jobs)):
+            for j2 in range(j1 + 1, len(instance.jobs)):
+                if rng.random() < 0.3:
+                    instance.add_conflict(j1, j2)
+        makespan, _ = optimal_solution(instance)
+        for add_implicit_conflicts in [False, True]:
+            reduction = instance.reduce(add_implicit_conflicts)
+            number_of_fixed_batches += len(reduction.fixed_batches)
+            reduced_makespan, reduced_batches = optimal_solution(
+                    reduction.instance)
+            report = reduction.check_solution(reduced_batches)
+            assert report["feasible"]
+            assert report["makespan"] == makespan
+            assert reduced_makespan + reduction.fixed_makespan == makespan
+    assert number_of_fixed_batches > 0
+
+
+def test_binary_round_trip(tmp_path):
+    # Writing an instance in the binary format and back to JSON keeps its
+    # data, with each conflict given once.
+    with open(instance_path(45)) as json_file:
+        data = json.load(json_file)
+    instance = m.Instance(instance_path(45))
+    instance.write(str(tmp_path / "instance.bin"))
+    binary_instance = m.Instance(str(tmp_path / "instance.bin"))
+    binary_instance.write(str(tmp_path / "instance.json"))
+    with open(tmp_path / "instance.json") as json_file:
+        round_trip_data = json.load(json_file)
+    assert round_trip_data["batch_capacity"] == data["batch_capacity"]
+    assert (
+            round_trip_data["job_processing_times"]
+            == data["job_processing_times"])
+    assert round_trip_data["job_sizes"] == data["job_sizes"]
+    assert (
+            sorted(tuple(conflict)
+                   for conflict in round_trip_data["conflicts"])
+            == sorted(set(
+                (min(conflict), max(conflict))
+                for conflict in data["conflicts"]
+                if conflict[0] != conflict[1])))
+
+
+def test_binary_invalid_input(tmp_path):
+    # The binary format only stores integers, and other files are rejected
+    # when read.
+    instance = m.Instance()
+    instance.batch_capacity = 10
+    instance.add_job(3, 2.5)
+    instance.add_job(4, 2)
+    with pytest.raises(ValueError):
+        instance.write(str(tmp_path / "instance.bin"))
+    instance = m.Instance()
+    instance.batch_capacity = 10.5
+    instance.add_job(3, 2)
+    with pytest.raises(ValueError):
+        instance.write(str(tmp_path / "instance.bin"))
+    with open(tmp_path / "instance.bin", 'wb') as binary_file:
+        binary_file.write(bytes(m.BINARY_HEADER.size))
+    with pytest.raises(ValueError):
+        m.Instance(str(tmp_path / "instance.bin"))
+
+
+def test_anytime_solutions_close(tmp_path):
+    # Closing the generator stops its solving thread long before the time
+    # limit.
+    filepath = str(tmp_path / "instance")
+    m.generate_instance(filepath, 300, 0.05, seed=5)
+    instance = m.Instance(filepath + ".json")
+    for algorithm in ["local_search", "limited_discrepancy_search"]:
+        number_of_threads = threading.active_count()
+        solutions = m.anytime_solutions(
+                instance,
+                algorithm=algorithm,
+                time_limit=60,
+                initial_solution=m.first_fit_decreasing(instance))
+        next(solutions)
+        start = time.time()
+        solutions.close()
+        while (
+                threading.active_count() > number_of_threads
+                and time.time() - start < 10):
+            time.sleep(0.01)
+        assert threading.active_count() == number_of_threads
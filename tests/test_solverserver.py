@@ -0,0 +1,21 @@
+import os
+import sys
+
+REPOSITORY_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(REPOSITORY_DIRECTORY)
+
+import batchschedulingwithconflictsmakespan
+import solverserver
+
+
+def test_time_limit(tmp_path):
+    # A request on a 300-job instance returns close to its time limit.
+    filepath = str(tmp_path / "instance")
+    batchschedulingwithconflictsmakespan.generate_instance(
+            filepath, 300, 0.05, seed=5)
+    for algorithm in ("greedy", "limited_discrepancy_search"):
+        response = solverserver.solve({
+            "instance_path": filepath + ".json",
+            "algorithm": algorithm,
+            "time_limit": 2})
+        assert response["time"] < 4